@@ -0,0 +1,141 @@
+import itertools
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Generic, TypeVar
+
+from abandonauth.settings import settings
+
+K = TypeVar("K")
+V = TypeVar("V")
+
+
+def get_worker_local_cache_size(configured_size: int | None, default_size: int) -> int:
+    """
+    Return the size of a cache whose invalidations only reach the current worker, 0 if it is disabled.
+
+    Unless a size is configured, the cache is only enabled when a single worker runs with the in-memory exchange token
+    store, as the database store is used when running several instances. Otherwise other workers would keep serving
+    entries that were invalidated until they expire.
+    """
+    if configured_size is not None:
+        return configured_size
+
+    if settings.WEB_CONCURRENCY > 1 or settings.EXCHANGE_TOKEN_STORE == "database":  # noqa: S105
+        return 0
+
+    return default_size
+
+
+@dataclass(frozen=True, slots=True)
+class CacheStats:
+    """Point in time statistics for a TTLCache."""
+
+    size: int
+    max_size: int
+    hits: int
+    misses: int
+    evictions: int
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of lookups that were served from the cache."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class TTLCache(Generic[K, V]):
+    """
+    Bounded least recently used cache whose entries expire after a time to live.
+
+    Entries may also be given an earlier expiry when they are set. A max_size of 0 disables the cache.
+    Expiry uses wall clock time so that it can be compared against timestamps such as a JWT's exp.
+
+    Values loaded across an await can be set with the generation of the key read before loading them, so that a value
+    loaded before the key was invalidated is not cached after the invalidation.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float) -> None:
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._entries: OrderedDict[K, tuple[float, V]] = OrderedDict()
+        # Generation of each invalidated key, and of the last clear. Only grows with the number of invalidated keys
+        self._generation_counter = itertools.count(1)
+        self._generations: dict[K, int] = {}
+        self._cleared_generation = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: K) -> V | None:
+        """Return the cached value for the given key, or None if it is not cached or has expired."""
+        entry = self._entries.get(key)
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, value = entry
+
+        if expires_at <= time.time():
+            del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def generation(self, key: K) -> int:
+        """Return the current generation of the given key, which changes whenever the key is invalidated or cleared."""
+        return max(self._generations.get(key, 0), self._cleared_generation)
+
+    def set(self, key: K, value: V, *, expires_at: float | None = None, generation: int | None = None) -> None:
+        """
+        Cache the value for the given key, evicting the least recently used entry if the cache is full.
+
+        The entry expires after the cache's time to live, or at expires_at if that is sooner.
+        If a generation is given, the value is only cached if the key was not invalidated since it was read.
+        """
+        if self.max_size <= 0:
+            return
+
+        if generation is not None and generation != self.generation(key):
+            return
+
+        entry_expires_at = time.time() + self.ttl_seconds
+        if expires_at is not None:
+            entry_expires_at = min(entry_expires_at, expires_at)
+
+        self._entries[key] = (entry_expires_at, value)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: K) -> None:
+        """Remove the given key from the cache if it is present, and start a new generation for it."""
+        self._entries.pop(key, None)
+        self._generations[key] = next(self._generation_counter)
+
+    def clear(self) -> None:
+        """Remove every entry from the cache, and start a new generation for every key."""
+        self._entries.clear()
+        self._generations.clear()
+        self._cleared_generation = next(self._generation_counter)
+
+    @property
+    def stats(self) -> CacheStats:
+        """Return the current size, hit, miss and eviction counts of the cache."""
+        return CacheStats(
+            size=len(self._entries),
+            max_size=self.max_size,
+            hits=self.hits,
+            misses=self.misses,
+            evictions=self.evictions,
+        )
@@ -1,3 +1,150 @@
+import time
+from contextvars import ContextVar
+from typing import Any, ClassVar
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import httpx
 from prisma import Prisma
+from prisma._types import PrismaMethod  # pyright: ignore [reportPrivateUsage]
+from prisma.errors import DataError
+from pydantic import BaseModel
+
+from abandonauth.metrics import (
+    database_pool_size,
+    database_pool_timeouts,
+    database_query_timeouts,
+    prisma_query_duration_seconds,
+)
+from abandonauth.settings import settings
+
+# Error codes returned by the query engine when no pooled connection became free in time, and when the database did not
+# answer in time
+POOL_TIMEOUT_ERROR_CODE = "P2024"
+QUERY_TIMEOUT_ERROR_CODE = "P1008"
+
+# Query methods that write to the database, reads made after one of these in the same request stay on the primary
+WRITE_METHODS = frozenset({
+    "execute_raw", "create", "delete", "update", "upsert", "create_many", "delete_many", "update_many",
+})
+
+# Whether the current request wrote to the primary database. Each request runs in its own context, so this starts False
+# for every request. Writes made in tasks spawned by the request are not seen by the request itself
+wrote_to_primary: ContextVar[bool] = ContextVar("wrote_to_primary", default=False)
+
+# Extra time given to the query engine before giving up on it, so that its own timeouts are reported first
+ENGINE_TIMEOUT_MARGIN_SECONDS = 1
+
+
+def get_pool_size() -> int:
+    """Return the number of database connections each worker may open."""
+    if settings.DATABASE_MAX_CONNECTIONS is None:
+        return settings.DATABASE_POOL_SIZE
+
+    return max(settings.DATABASE_MAX_CONNECTIONS // settings.WEB_CONCURRENCY, 1)
+
+
+def get_database_url(database_url: str, pool_size: int) -> str:
+    """Return the given database URL with the connection pool and query timeout settings applied."""
+    url = urlsplit(database_url)
+    parameters = dict(parse_qsl(url.query))
+    parameters.update(
+        connection_limit=str(pool_size),
+        pool_timeout=str(settings.DATABASE_POOL_TIMEOUT_SECONDS),
+        socket_timeout=str(settings.DATABASE_QUERY_TIMEOUT_SECONDS),
+    )
+
+    return urlunsplit(url._replace(query=urlencode(parameters)))
+
+
+class InstrumentedPrisma(Prisma):
+    """
+    Prisma client recording the duration of every query by model and query method, and queries that timed out.
+
+    Writes are remembered for the rest of the request, so that get_read_client keeps its reads on the primary.
+    """
+
+    database: ClassVar[str] = "primary"
+
+    async def _execute(
+            self,
+            *,
+            method: PrismaMethod,
+            arguments: dict[str, Any],
+            model: type[BaseModel] | None = None,
+            root_selection: list[str] | None = None,
+    ) -> Any:
+        if method in WRITE_METHODS:
+            wrote_to_primary.set(True)
+
+        started_at = time.perf_counter()
+
+        try:
+            return await super()._execute(
+                method=method,
+                arguments=arguments,
+                model=model,
+                root_selection=root_selection,
+            )
+        except DataError as e:
+            if e.code == POOL_TIMEOUT_ERROR_CODE:
+                database_pool_timeouts.inc()
+            elif e.code == QUERY_TIMEOUT_ERROR_CODE:
+                database_query_timeouts.inc()
+
+            raise
+        except httpx.TimeoutException:
+            database_query_timeouts.inc()
+            raise
+        finally:
+            # Partial models and projections report the name of the model they select from
+            model_name = getattr(model, "__prisma_model__", "raw")
+            prisma_query_duration_seconds.labels(self.database, model_name, method).observe(
+                time.perf_counter() - started_at,
+            )
+
+
+class ReplicaPrisma(InstrumentedPrisma):
+    """Prisma client connected to the read replica, only used for read-only queries through get_read_client."""
+
+    database: ClassVar[str] = "replica"
+
+
+def _create_client(client_class: type[InstrumentedPrisma], database_url: str, **kwargs: Any) -> InstrumentedPrisma:
+    """Create a Prisma client with the connection pool and timeout settings applied to the given database URL."""
+    return client_class(
+        datasource={"url": get_database_url(database_url, pool_size)},
+        http={
+            "timeout": (
+                settings.DATABASE_POOL_TIMEOUT_SECONDS
+                + settings.DATABASE_QUERY_TIMEOUT_SECONDS
+                + ENGINE_TIMEOUT_MARGIN_SECONDS
+            ),
+        },
+        **kwargs,
+    )
+
+
+pool_size = get_pool_size()
+database_pool_size.set(pool_size)
+
+prisma_db = _create_client(InstrumentedPrisma, settings.DATABASE_URL.get_secret_value(), auto_register=True)
+
+replica_db = (
+    _create_client(ReplicaPrisma, settings.DATABASE_REPLICA_URL.get_secret_value())
+    if settings.DATABASE_REPLICA_URL
+    else None
+)
+
+
+def get_read_client() -> InstrumentedPrisma:
+    """
+    Return the client that read-only queries should use, passed to Model.prisma().
+
+    Reads go to the replica when one is configured, unless the current request already wrote to the primary so that it
+    reads its own writes. Replica reads can lag slightly behind the primary, queries that must see the latest data, such
+    as credential checks, should keep using the primary.
+    """
+    if replica_db is None or wrote_to_primary.get() or not replica_db.is_connected():
+        return prisma_db
 
-prisma_db = Prisma(auto_register=True)
+    return replica_db
@@ -1,11 +1,74 @@
+import hashlib
+import hmac
 from typing import Annotated
+from uuid import UUID
 
 from fastapi import Depends, HTTPException
 from prisma.models import DeveloperApplication
 from starlette.status import HTTP_403_FORBIDDEN
 
-from abandonauth.dependencies.auth.hash import verify_data
+from abandonauth.cache import TTLCache, get_worker_local_cache_size
+from abandonauth.dependencies.auth.hash import get_refresh_token_hash, is_legacy_refresh_token_hash, verify_data
 from abandonauth.models.developer_application import LoginDeveloperApplicationDto
+from abandonauth.settings import settings
+
+DEFAULT_CREDENTIAL_CACHE_MAX_SIZE = 1024
+
+# Developer applications that recently authenticated, keyed by application ID.
+# Values are the SHA-256 digest of the verified refresh token and the authenticated application.
+verified_credentials_cache: TTLCache[str, tuple[bytes, DeveloperApplication]] = TTLCache(
+    max_size=get_worker_local_cache_size(settings.CREDENTIAL_CACHE_MAX_SIZE, DEFAULT_CREDENTIAL_CACHE_MAX_SIZE),
+    ttl_seconds=settings.CREDENTIAL_CACHE_TTL_SECONDS,
+)
+
+
+def invalidate_developer_application_credentials(application_id: str) -> None:
+    """Forget any cached successful authentication for the given developer application."""
+    verified_credentials_cache.invalidate(application_id)
+
+
+async def authenticate_developer_application(
+        application_id: UUID,
+        refresh_token: str,
+) -> DeveloperApplication | None:
+    """
+    Return the developer application with the given ID if the refresh token is valid, otherwise return None.
+
+    Applications with a legacy bcrypt refresh token hash are migrated to the keyed hash on successful authentication.
+    Successful authentications are cached, repeated logins with the same credentials skip the database and hashing.
+    An authentication that was in flight when the application's credentials were invalidated is not cached.
+    """
+    app_id = str(application_id)
+    refresh_token_digest = hashlib.sha256(refresh_token.encode()).digest()
+
+    cached = verified_credentials_cache.get(app_id)
+    if cached is not None and hmac.compare_digest(cached[0], refresh_token_digest):
+        return cached[1]
+
+    generation = verified_credentials_cache.generation(app_id)
+    dev_app = await DeveloperApplication.prisma().find_unique(
+        {
+            "id": app_id,
+        },
+    )
+
+    if not dev_app or not await verify_data(refresh_token, dev_app.refresh_token):
+        return None
+
+    if is_legacy_refresh_token_hash(dev_app.refresh_token):
+        dev_app = await DeveloperApplication.prisma().update(
+            where={
+                "id": dev_app.id,
+            },
+            data={
+                "refresh_token": get_refresh_token_hash(refresh_token),
+            },
+        )
+
+    if dev_app:
+        verified_credentials_cache.set(app_id, (refresh_token_digest, dev_app), generation=generation)
+
+    return dev_app
 
 
 async def authenticate_developer_app_from_optional_app_id_and_secret(
@@ -20,13 +83,9 @@ async def authenticate_developer_app_from_optional_app_id_and_secret(
     if login_data is None:
         return None
 
-    dev_app = await DeveloperApplication.prisma().find_unique(
-        {
-            "id": str(login_data.id),
-        },
-    )
+    dev_app = await authenticate_developer_application(login_data.id, login_data.refresh_token)
 
-    if not dev_app or not verify_data(login_data.refresh_token, dev_app.refresh_token):
+    if not dev_app:
         raise HTTPException(
             status_code=HTTP_403_FORBIDDEN,
             detail="Invalid username or refresh token",
@@ -0,0 +1,215 @@
+import hashlib
+import heapq
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
+
+from prisma.models import ExchangeToken
+
+from abandonauth.settings import settings
+
+# How often the database store clears out expired exchange tokens that were never used
+EXPIRED_TOKEN_PURGE_INTERVAL = timedelta(minutes=5)
+
+
+def token_digest(token: str) -> str:
+    """Return the digest used to identify the given token inside an exchange token store."""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class ExchangeTokenStore(ABC):
+    """
+    Storage for issued short-lived exchange tokens.
+
+    Every token added to the store can be consumed exactly once. Expired tokens are never reported as present.
+    """
+
+    @abstractmethod
+    async def add(self, token: str, expires_at: datetime) -> None:
+        """Store the given token until it is consumed or expires."""
+
+    @abstractmethod
+    async def contains(self, token: str) -> bool:
+        """Return True if the given token is stored and has not expired."""
+
+    @abstractmethod
+    async def consume(self, token: str) -> bool:
+        """
+        Remove the given token from the store.
+
+        The check and removal are atomic, only one caller consuming a given token will receive True.
+        """
+
+
+@dataclass(frozen=True, slots=True)
+class ExchangeTokenStoreStats:
+    """Point in time statistics for an in-memory exchange token store."""
+
+    size: int
+    max_size: int
+    expired_evictions: int
+    capacity_evictions: int
+
+
+class InMemoryExchangeTokenStore(ExchangeTokenStore):
+    """
+    Bounded exchange token store kept in the memory of the current process.
+
+    Only the 32 byte SHA-256 digest of each token is kept. Entries are evicted once their expiry passes, and when the
+    store is full the entries closest to expiring are evicted to make room for new tokens.
+    Tokens are not shared between workers, this store should only be used when running a single worker.
+    """
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self.expired_evictions = 0
+        self.capacity_evictions = 0
+
+        self._tokens: dict[bytes, float] = {}
+        # Min-heap of (expiry timestamp, digest). Consumed tokens are left in the heap and skipped when popped
+        self._expiry_heap: list[tuple[float, bytes]] = []
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def _pop_soonest_expiring(self) -> bool:
+        """
+        Pop heap entries until a stored token is evicted, whatever its expiry. Return False if the heap was exhausted.
+
+        Only used to make room when the store is full.
+        """
+        while self._expiry_heap:
+            expires_at, key = heapq.heappop(self._expiry_heap)
+
+            # Skip heap entries for tokens that were already consumed
+            if self._tokens.get(key) == expires_at:
+                del self._tokens[key]
+                return True
+
+        return False
+
+    def _evict_expired(self, now: float) -> None:
+        """Evict every token whose expiry has passed."""
+        while self._expiry_heap and self._expiry_heap[0][0] <= now:
+            expires_at, key = heapq.heappop(self._expiry_heap)
+
+            # Consumed tokens are skipped, only the expired entry itself may be deleted
+            if self._tokens.get(key) == expires_at:
+                del self._tokens[key]
+                self.expired_evictions += 1
+
+        # Rebuild the heap if consumed tokens make up most of it, keeping memory bounded by max_size
+        if len(self._expiry_heap) > 2 * max(len(self._tokens), self.max_size):
+            self._expiry_heap = [(expires_at, key) for key, expires_at in self._tokens.items()]
+            heapq.heapify(self._expiry_heap)
+
+    async def add(self, token: str, expires_at: datetime) -> None:
+        """Store the given token until it is consumed or expires, evicting the soonest expiring tokens if full."""
+        self._evict_expired(time.time())
+
+        while len(self._tokens) >= self.max_size and self._pop_soonest_expiring():
+            self.capacity_evictions += 1
+
+        key = self._key(token)
+        expiry_timestamp = expires_at.timestamp()
+
+        self._tokens[key] = expiry_timestamp
+        heapq.heappush(self._expiry_heap, (expiry_timestamp, key))
+
+    async def contains(self, token: str) -> bool:
+        """Return True if the given token is stored and has not expired."""
+        now = time.time()
+        self._evict_expired(now)
+
+        expires_at = self._tokens.get(self._key(token))
+        return expires_at is not None and expires_at > now
+
+    async def consume(self, token: str) -> bool:
+        """Remove the given token from the store, returning True if it was present and had not expired."""
+        now = time.time()
+        self._evict_expired(now)
+
+        # There is no await between the lookup and the removal, so this can not be interleaved with another consume
+        expires_at = self._tokens.pop(self._key(token), None)
+        return expires_at is not None and expires_at > now
+
+    @property
+    def stats(self) -> ExchangeTokenStoreStats:
+        """Return the current size and eviction counts of the store."""
+        return ExchangeTokenStoreStats(
+            size=len(self._tokens),
+            max_size=self.max_size,
+            expired_evictions=self.expired_evictions,
+            capacity_evictions=self.capacity_evictions,
+        )
+
+
+class DatabaseExchangeTokenStore(ExchangeTokenStore):
+    """
+    Exchange token store backed by the ExchangeToken table.
+
+    Tokens are shared by every worker connected to the database, allowing the API to run behind a load balancer.
+    Only a digest of each token is stored.
+    """
+
+    def __init__(self) -> None:
+        self._last_purge = datetime.min.replace(tzinfo=UTC)
+
+    async def add(self, token: str, expires_at: datetime) -> None:
+        """Store the given token until it is consumed or expires."""
+        await ExchangeToken.prisma().create({
+            "id": token_digest(token),
+            "expires_at": expires_at,
+        })
+
+        await self._purge_expired()
+
+    async def contains(self, token: str) -> bool:  # noqa: PLR6301
+        """Return True if the given token is stored and has not expired."""
+        count = await ExchangeToken.prisma().count(
+            where={
+                "id": token_digest(token),
+                "expires_at": {"gt": datetime.now(UTC)},
+            },
+        )
+
+        return count > 0
+
+    async def consume(self, token: str) -> bool:  # noqa: PLR6301
+        """Remove the given token from the store, returning True if it was present and had not expired."""
+        # A single DELETE is atomic, if multiple workers consume the same token only one of them will delete the row
+        deleted = await ExchangeToken.prisma().delete_many(
+            where={
+                "id": token_digest(token),
+                "expires_at": {"gt": datetime.now(UTC)},
+            },
+        )
+
+        return deleted == 1
+
+    async def _purge_expired(self) -> None:
+        """Delete tokens that expired without being consumed, at most once per purge interval."""
+        now = datetime.now(UTC)
+
+        if now - self._last_purge < EXPIRED_TOKEN_PURGE_INTERVAL:
+            return
+
+        self._last_purge = now
+        await ExchangeToken.prisma().delete_many(
+            where={
+                "expires_at": {"lt": now},
+            },
+        )
+
+
+def _create_exchange_token_store() -> ExchangeTokenStore:
+    """Create the exchange token store configured in settings."""
+    if settings.EXCHANGE_TOKEN_STORE == "database":  # noqa: S105
+        return DatabaseExchangeTokenStore()
+
+    return InMemoryExchangeTokenStore(max_size=settings.EXCHANGE_TOKEN_CACHE_MAX_SIZE)
+
+
+exchange_token_store = _create_exchange_token_store()
@@ -1,17 +1,130 @@
+import asyncio
+import hashlib
+import hmac
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import ParamSpec, TypeVar
+
 from passlib import pwd
 from passlib.context import CryptContext
 
+from abandonauth.metrics import (
+    HistogramChild,
+    bcrypt_hash_duration,
+    bcrypt_verify_duration,
+    hash_pool_wait_seconds,
+)
+from abandonauth.settings import settings
+
+P = ParamSpec("P")
+T = TypeVar("T")
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# Prefix identifying hashes created by get_refresh_token_hash, anything else is treated as a bcrypt hash
+REFRESH_TOKEN_HASH_PREFIX = "$hmac-sha256$"  # noqa: S105
+
+# bcrypt releases the GIL while hashing, so running it in threads keeps the event loop free to serve other requests
+hash_executor = ThreadPoolExecutor(max_workers=settings.HASH_POOL_SIZE, thread_name_prefix="abandonauth-hash")
+
+
+@dataclass(slots=True)
+class HashPoolStats:
+    """Statistics for the work submitted to the hashing thread pool."""
+
+    pool_size: int
+    pending: int = 0
+    completed: int = 0
+    total_wait_seconds: float = 0.0
+    max_wait_seconds: float = 0.0
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of hashing jobs waiting for a free thread."""
+        return max(self.pending - self.pool_size, 0)
+
+    @property
+    def average_wait_seconds(self) -> float:
+        """Average time a hashing job waited for a free thread."""
+        return self.total_wait_seconds / self.completed if self.completed else 0.0
+
+
+hash_pool_stats = HashPoolStats(pool_size=settings.HASH_POOL_SIZE)
+
+
+async def _run_in_hash_pool(
+        duration_metric: HistogramChild,
+        func: Callable[P, T],
+        *args: P.args,
+        **kwargs: P.kwargs,
+) -> T:
+    """
+    Run the given blocking hash function in the hashing thread pool.
+
+    Records how long it waited to start, and how long it ran in the given metric.
+    """
+    submitted_at = time.perf_counter()
 
-def verify_data(plain_data: str, hashed_data: str) -> bool:
-    """Verify data against the hashed data."""
-    return pwd_context.verify(plain_data, hashed_data)
+    def run() -> tuple[float, float, T]:
+        started_at = time.perf_counter()
+        result = func(*args, **kwargs)
+        return started_at, time.perf_counter(), result
 
+    hash_pool_stats.pending += 1
+    try:
+        started_at, finished_at, result = await asyncio.get_running_loop().run_in_executor(hash_executor, run)
+    finally:
+        hash_pool_stats.pending -= 1
 
-def get_hashed_data(data: str) -> str:
+    wait_seconds = started_at - submitted_at
+    hash_pool_stats.completed += 1
+    hash_pool_stats.total_wait_seconds += wait_seconds
+    hash_pool_stats.max_wait_seconds = max(hash_pool_stats.max_wait_seconds, wait_seconds)
+
+    hash_pool_wait_seconds.observe(wait_seconds)
+    duration_metric.observe(finished_at - started_at)
+
+    return result
+
+
+async def verify_data(plain_data: str, hashed_data: str) -> bool:
+    """
+    Verify data against the hashed data.
+
+    Accepts both bcrypt hashes and keyed refresh token hashes created with get_refresh_token_hash.
+    """
+    if hashed_data.startswith(REFRESH_TOKEN_HASH_PREFIX):
+        return hmac.compare_digest(get_refresh_token_hash(plain_data), hashed_data)
+
+    return await _run_in_hash_pool(bcrypt_verify_duration, pwd_context.verify, plain_data, hashed_data)
+
+
+async def get_hashed_data(data: str) -> str:
     """Hash and return the given data."""
-    return pwd_context.hash(data)
+    return await _run_in_hash_pool(bcrypt_hash_duration, pwd_context.hash, data)
+
+
+def get_refresh_token_hash(refresh_token: str) -> str:
+    """
+    Hash and return the given refresh token using HMAC-SHA256 keyed with the server pepper.
+
+    This must only be used for high entropy secrets such as those from generate_refresh_token, never for passwords.
+    The entropy of the token makes brute forcing infeasible, so a slow hash like bcrypt adds cost but no security.
+    """
+    digest = hmac.new(
+        settings.REFRESH_TOKEN_PEPPER.get_secret_value().encode(),
+        refresh_token.encode(),
+        hashlib.sha256,
+    ).hexdigest()
+
+    return f"{REFRESH_TOKEN_HASH_PREFIX}{digest}"
+
+
+def is_legacy_refresh_token_hash(hashed_data: str) -> bool:
+    """Return True if the given refresh token hash was created with bcrypt and should be replaced."""
+    return not hashed_data.startswith(REFRESH_TOKEN_HASH_PREFIX)
 
 
 def generate_refresh_token() -> str:
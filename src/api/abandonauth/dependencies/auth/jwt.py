@@ -1,3 +1,6 @@
+import hashlib
+import secrets
+import time
 from datetime import UTC, datetime, timedelta
 from typing import Any
 
@@ -6,16 +9,25 @@ from fastapi.security import HTTPBearer
 from jose import JWTError, jwt
 from starlette.status import HTTP_401_UNAUTHORIZED, HTTP_403_FORBIDDEN
 
+from abandonauth.cache import TTLCache
+from abandonauth.dependencies.auth.exchange_token_store import exchange_token_store
+from abandonauth.dependencies.auth.revocation import revocation_list
+from abandonauth.dependencies.auth.signing_keys import get_signing_key, get_verification_key
+from abandonauth.metrics import jwt_decode_duration, jwt_encode_duration
 from abandonauth.models.auth import JwtClaimsDataDto, LifespanEnum, ScopeEnum
 from abandonauth.settings import settings
 
-# Cache of all valid issued tokens. Tokens should be removed after their first use
-valid_token_cache = set()
-
 IGNORE_AUD_DECODE_OPTIONS = {"verify_aud": False}
 
+# Validated claims of recently decoded long-lived tokens, keyed by the SHA-256 digest of the token.
+# Entries never outlive the token's exp, audience and scope are still checked on every decode
+decoded_token_cache: TTLCache[bytes, JwtClaimsDataDto] = TTLCache(
+    max_size=settings.JWT_DECODE_CACHE_MAX_SIZE,
+    ttl_seconds=settings.JWT_DECODE_CACHE_TTL_SECONDS,
+)
+
 
-def _generate_jwt(user_id: str, application_id_aud: str, *, long_lived: bool = False) -> str:
+async def _generate_jwt(user_id: str, application_id_aud: str, *, long_lived: bool = False) -> str:
     """
     Generate an AbandonAuth long-lived or short-lived JWT for the given user.
 
@@ -29,7 +41,8 @@ def _generate_jwt(user_id: str, application_id_aud: str, *, long_lived: bool = F
     else:
         exp_seconds = settings.JWT_EXPIRES_IN_SECONDS_SHORT_LIVED
 
-    expiration = datetime.now(UTC) + timedelta(seconds=exp_seconds)
+    issued_at = datetime.now(UTC)
+    expiration = issued_at + timedelta(seconds=exp_seconds)
 
     if long_lived and application_id_aud == settings.ABANDON_AUTH_DEVELOPER_APP_ID:
         scope = f"{ScopeEnum.abandonauth} {ScopeEnum.identify}"
@@ -42,72 +55,122 @@ def _generate_jwt(user_id: str, application_id_aud: str, *, long_lived: bool = F
         scope=scope,
         aud=application_id_aud,
         lifespan=LifespanEnum.long if long_lived else LifespanEnum.short,
+        jti=secrets.token_urlsafe(16),
+        iat=issued_at,
     )
 
+    key, headers = get_signing_key()
+
+    started_at = time.perf_counter()
     token = jwt.encode(
         claims=dict(claims),
-        key=settings.JWT_SECRET.get_secret_value(),
+        key=key,
         algorithm=settings.JWT_HASHING_ALGO,
+        headers=headers,
     )
+    jwt_encode_duration.observe(time.perf_counter() - started_at)
+
     if not long_lived:
-        valid_token_cache.add(token)
+        await exchange_token_store.add(token, expiration)
 
     return token
 
 
-def decode_jwt(
+def _decode_jwt_claims(token: str) -> JwtClaimsDataDto:
+    """
+    Verify the signature of the given JWT and return its claims.
+
+    The audience is not checked here, so that the result can be cached and reused for any audience.
+    """
+    started_at = time.perf_counter()
+
+    try:
+        token_data = jwt.decode(
+            token,
+            get_verification_key(token),
+            algorithms=[settings.JWT_HASHING_ALGO],
+            options=IGNORE_AUD_DECODE_OPTIONS,
+        )
+    except JWTError as e:
+        raise HTTPException(
+            status_code=HTTP_403_FORBIDDEN,
+            detail="Invalid token format",
+        ) from e
+    finally:
+        jwt_decode_duration.observe(time.perf_counter() - started_at)
+
+    return JwtClaimsDataDto(**dict(token_data))
+
+
+async def decode_jwt(
         token: str,
         aud: str | None = None,
         required_scope: ScopeEnum = ScopeEnum.abandonauth,
+        *,
+        consume_exchange_token: bool = False,
 ) -> JwtClaimsDataDto:
     """
     Decode and return all claim data for the given JWT.
 
     Raises errors if invalid, or unauthorized JWT is supplied.
+    If consume_exchange_token is True and the JWT is a short-lived exchange token, the token is consumed and will not be
+    valid for any further use.
     """
-    try:
-        decode_kwargs = {"audience": aud} if aud else {"options": IGNORE_AUD_DECODE_OPTIONS}
+    cache_key = hashlib.sha256(token.encode()).digest()
+    token_data = decoded_token_cache.get(cache_key)
 
-        token_data = jwt.decode(
-            token,
-            settings.JWT_SECRET.get_secret_value(),
-            **decode_kwargs,  # pyright: ignore [reportArgumentType]
-        )
-    except JWTError as e:
+    if token_data is None:
+        token_data = _decode_jwt_claims(token)
+
+        if token_data.lifespan == LifespanEnum.long:
+            decoded_token_cache.set(cache_key, token_data, expires_at=token_data.exp.timestamp())
+
+    if aud and token_data.aud != aud:
         raise HTTPException(
             status_code=HTTP_403_FORBIDDEN,
             detail="Invalid token format",
-        ) from e
+        )
 
-    if token_data["exp"] < datetime.now(UTC).timestamp():
+    if token_data.exp < datetime.now(UTC):
         raise HTTPException(
             status_code=HTTP_403_FORBIDDEN,
             detail="Token has expired",
         )
 
-    if required_scope != ScopeEnum.none and required_scope not in token_data["scope"]:
+    # Checked against the in-memory revocation list, so tokens that were not revoked cost no database query
+    if token_data.lifespan == LifespanEnum.long and revocation_list.is_revoked(token_data):
+        raise HTTPException(
+            status_code=HTTP_403_FORBIDDEN,
+            detail="Token has been revoked",
+        )
+
+    if required_scope != ScopeEnum.none and required_scope not in token_data.scope:
         raise HTTPException(
             status_code=HTTP_403_FORBIDDEN,
             detail="JWT lacks the required scope to access this endpoint.",
         )
 
-    # If token is short-lived/exchange token check if it currently exists in the token cache
-    # This means short-lived tokens will only work with a single worker
-    # This is a hack and a future version will resolve this https://github.com/AbandonTech/abandonauth/issues/12
-    if token_data["lifespan"] == "short" and token not in valid_token_cache:
-        raise HTTPException(status_code=HTTP_401_UNAUTHORIZED, detail="Token is not valid.")
+    # If token is short-lived/exchange token check if it currently exists in the exchange token store
+    if token_data.lifespan == LifespanEnum.short:
+        if consume_exchange_token:
+            token_is_valid = await exchange_token_store.consume(token)
+        else:
+            token_is_valid = await exchange_token_store.contains(token)
 
-    return JwtClaimsDataDto(**dict(token_data))
+        if not token_is_valid:
+            raise HTTPException(status_code=HTTP_401_UNAUTHORIZED, detail="Token is not valid.")
+
+    return token_data
 
 
-def generate_long_lived_jwt(user_id: str, application_id_aud: str) -> str:
+async def generate_long_lived_jwt(user_id: str, application_id_aud: str) -> str:
     """Generate a long lived JWT token using the given user ID."""
-    return _generate_jwt(user_id, application_id_aud, long_lived=True)
+    return await _generate_jwt(user_id, application_id_aud, long_lived=True)
 
 
-def generate_short_lived_jwt(user_id: str, application_id_aud: str) -> str:
+async def generate_short_lived_jwt(user_id: str, application_id_aud: str) -> str:
     """Create a JWT token using the given user ID."""
-    return _generate_jwt(user_id, application_id_aud, long_lived=False)
+    return await _generate_jwt(user_id, application_id_aud, long_lived=False)
 
 
 class JWTBearer(HTTPBearer):
@@ -143,7 +206,7 @@ class JWTBearer(HTTPBearer):
 
         credentials_string = credentials.credentials
 
-        return decode_jwt(credentials_string, self.aud, self.required_scope)
+        return await decode_jwt(credentials_string, self.aud, self.required_scope)
 
 
 class DeveloperAppJwtBearer(JWTBearer):
@@ -196,4 +259,4 @@ class OptionalDeveloperAppJwtBearer(HTTPBearer):
 
         credentials_string = credentials.credentials
 
-        return decode_jwt(credentials_string, self.aud, self.required_scope)
+        return await decode_jwt(credentials_string, self.aud, self.required_scope)
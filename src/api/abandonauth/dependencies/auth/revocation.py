@@ -0,0 +1,174 @@
+import asyncio
+import logging
+import math
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
+
+from prisma.models import RevokedToken, UserTokenRevocation
+
+from abandonauth.models.auth import JwtClaimsDataDto
+from abandonauth.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Rows changed shortly before the previous refresh are fetched again, so revocations committed late or recorded by a
+# worker with a slightly different clock are not missed
+REFRESH_OVERLAP = timedelta(seconds=30)
+
+# How often revocations that no longer apply are deleted from the database
+EXPIRED_REVOCATION_PURGE_INTERVAL = timedelta(minutes=5)
+
+
+@dataclass(frozen=True, slots=True)
+class RevocationListStats:
+    """Point in time statistics for a RevocationList."""
+
+    revoked_tokens: int
+    revoked_users: int
+    refreshes: int
+
+
+class RevocationList:
+    """
+    In-memory copy of the revoked long-lived tokens, so that checking a token does not query the database.
+
+    Tokens are revoked individually by their jti, or for a user by revoking every token issued to them before a point
+    in time. Revocations are stored in the RevokedToken and UserTokenRevocation tables. Only the rows changed since the
+    previous refresh are fetched, revocations made by other workers apply once this worker next refreshes.
+    Entries are dropped once the tokens they revoke have expired.
+    """
+
+    def __init__(self) -> None:
+        self.refreshes = 0
+
+        # jti to the expiry timestamp of the revoked token
+        self._revoked_tokens: dict[str, float] = {}
+        # User ID to the whole second timestamp before which every token issued to the user is revoked
+        self._users_revoked_before: dict[str, float] = {}
+        self._last_refresh: datetime | None = None
+        self._last_purge = datetime.min.replace(tzinfo=UTC)
+
+    def is_revoked(self, token_data: JwtClaimsDataDto) -> bool:
+        """Return True if the given token was revoked, without querying the database."""
+        if token_data.jti is not None and token_data.jti in self._revoked_tokens:
+            return True
+
+        revoked_before = self._users_revoked_before.get(token_data.user_id)
+        if revoked_before is None:
+            return False
+
+        # Tokens issued before iat was added to the claims are assumed to have been issued with the current lifetime
+        if token_data.iat is not None:
+            issued_at = token_data.iat
+        else:
+            issued_at = token_data.exp - timedelta(seconds=settings.JWT_EXPIRES_IN_SECONDS_LONG_LIVED)
+
+        # iat only has whole second resolution, so tokens issued in the same second as the revocation are kept.
+        # Otherwise a token issued right after the revocation would be revoked for its whole lifetime
+        return issued_at.timestamp() < revoked_before
+
+    async def revoke_token(self, jti: str, expires_at: datetime) -> None:
+        """Revoke the token with the given jti until it expires."""
+        now = datetime.now(UTC)
+
+        await RevokedToken.prisma().upsert(
+            where={"id": jti},
+            data={
+                "create": {"id": jti, "expires_at": expires_at, "revoked_at": now},
+                "update": {},
+            },
+        )
+
+        self._revoked_tokens[jti] = expires_at.timestamp()
+
+    async def revoke_user(self, user_id: str) -> None:
+        """Revoke every token issued to the given user before the current second."""
+        # Rounded down to the resolution of iat, see is_revoked
+        now = datetime.now(UTC).replace(microsecond=0)
+
+        await UserTokenRevocation.prisma().upsert(
+            where={"user_id": user_id},
+            data={
+                "create": {"user_id": user_id, "revoked_before": now},
+                "update": {"revoked_before": now},
+            },
+        )
+
+        self._users_revoked_before[user_id] = now.timestamp()
+
+    async def refresh(self) -> None:
+        """Fetch the revocations made since the previous refresh, and drop revocations that no longer apply."""
+        now = datetime.now(UTC)
+        # Revoking a user's tokens only affects tokens issued before it, which have all expired after one lifetime
+        oldest_relevant = now - timedelta(seconds=settings.JWT_EXPIRES_IN_SECONDS_LONG_LIVED)
+        changed_since = self._last_refresh - REFRESH_OVERLAP if self._last_refresh else oldest_relevant
+
+        revoked_tokens = await RevokedToken.prisma().find_many(
+            where={
+                "revoked_at": {"gte": changed_since},
+                "expires_at": {"gt": now},
+            },
+        )
+        user_revocations = await UserTokenRevocation.prisma().find_many(
+            where={
+                "revoked_before": {"gte": max(changed_since, oldest_relevant)},
+            },
+        )
+
+        for revoked_token in revoked_tokens:
+            self._revoked_tokens[revoked_token.id] = revoked_token.expires_at.timestamp()
+
+        for user_revocation in user_revocations:
+            revoked_before = math.floor(user_revocation.revoked_before.timestamp())
+            current = self._users_revoked_before.get(user_revocation.user_id, revoked_before)
+            self._users_revoked_before[user_revocation.user_id] = max(current, revoked_before)
+
+        self._prune(now.timestamp(), oldest_relevant.timestamp())
+        self._last_refresh = now
+        self.refreshes += 1
+
+        await self._purge_expired(now, oldest_relevant)
+
+    def _prune(self, now: float, oldest_relevant: float) -> None:
+        """Drop revocations of tokens that have expired."""
+        self._revoked_tokens = {k: v for k, v in self._revoked_tokens.items() if v > now}
+        self._users_revoked_before = {k: v for k, v in self._users_revoked_before.items() if v > oldest_relevant}
+
+    async def _purge_expired(self, now: datetime, oldest_relevant: datetime) -> None:
+        """Delete revocations of tokens that have expired from the database, at most once per purge interval."""
+        if now - self._last_purge < EXPIRED_REVOCATION_PURGE_INTERVAL:
+            return
+
+        self._last_purge = now
+        await RevokedToken.prisma().delete_many(
+            where={
+                "expires_at": {"lt": now},
+            },
+        )
+        await UserTokenRevocation.prisma().delete_many(
+            where={
+                "revoked_before": {"lt": oldest_relevant},
+            },
+        )
+
+    async def run(self) -> None:
+        """Refresh the revocation list every TOKEN_REVOCATION_REFRESH_SECONDS until cancelled."""
+        while True:
+            try:
+                await self.refresh()
+            except Exception:
+                logger.exception("Refreshing the token revocation list failed")
+
+            await asyncio.sleep(settings.TOKEN_REVOCATION_REFRESH_SECONDS)
+
+    @property
+    def stats(self) -> RevocationListStats:
+        """Return the current size of the revocation list and the number of refreshes."""
+        return RevocationListStats(
+            revoked_tokens=len(self._revoked_tokens),
+            revoked_users=len(self._users_revoked_before),
+            refreshes=self.refreshes,
+        )
+
+
+revocation_list = RevocationList()
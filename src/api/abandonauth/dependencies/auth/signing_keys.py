@@ -0,0 +1,83 @@
+from dataclasses import dataclass
+from pathlib import Path
+
+from jose import JWTError, jwk, jwt
+from jose.backends.base import Key
+from jose.constants import ALGORITHMS
+
+from abandonauth.models.auth import JwksDto
+from abandonauth.settings import settings
+
+ASYMMETRIC_ALGORITHMS = ALGORITHMS.EC | ALGORITHMS.RSA
+
+
+@dataclass(frozen=True, slots=True)
+class SigningKey:
+    """A private key used to sign JWTs and its public key used to verify them."""
+
+    kid: str
+    private_key: Key
+    public_key: Key
+
+    @property
+    def public_jwk(self) -> dict[str, str]:
+        """Return the public key as a JWK, suitable for publishing to relying applications."""
+        return {**self.public_key.to_dict(), "kid": self.kid, "use": "sig"}
+
+
+def _load_signing_keys() -> dict[str, SigningKey]:
+    """
+    Load every "<kid>.pem" private key in JWT_SIGNING_KEYS_DIR when signing with an asymmetric algorithm.
+
+    Returns an empty dict when JWTs are signed with the shared JWT_SECRET.
+    """
+    if settings.JWT_HASHING_ALGO not in ASYMMETRIC_ALGORITHMS:
+        return {}
+
+    if not settings.JWT_SIGNING_KEYS_DIR or not settings.JWT_ACTIVE_KEY_ID:
+        msg = f"JWT_SIGNING_KEYS_DIR and JWT_ACTIVE_KEY_ID are required when using {settings.JWT_HASHING_ALGO}"
+        raise ValueError(msg)
+
+    keys = {}
+
+    for path in sorted(Path(settings.JWT_SIGNING_KEYS_DIR).glob("*.pem")):
+        private_key = jwk.construct(path.read_text(), settings.JWT_HASHING_ALGO)
+        keys[path.stem] = SigningKey(kid=path.stem, private_key=private_key, public_key=private_key.public_key())
+
+    if settings.JWT_ACTIVE_KEY_ID not in keys:
+        msg = f"Active key {settings.JWT_ACTIVE_KEY_ID} was not found in {settings.JWT_SIGNING_KEYS_DIR}"
+        raise ValueError(msg)
+
+    return keys
+
+
+# Every loaded key is accepted for verification and published, so keys can be rotated without invalidating tokens
+signing_keys = _load_signing_keys()
+jwks = JwksDto(keys=[key.public_jwk for key in signing_keys.values()])
+
+
+def get_signing_key() -> tuple[str | Key, dict[str, str] | None]:
+    """Return the key new JWTs should be signed with, and the headers identifying that key."""
+    if not signing_keys:
+        return settings.JWT_SECRET.get_secret_value(), None
+
+    active_key = signing_keys[settings.JWT_ACTIVE_KEY_ID]  # pyright: ignore [reportArgumentType]
+    return active_key.private_key, {"kid": active_key.kid}
+
+
+def get_verification_key(token: str) -> str | Key:
+    """
+    Return the key the given JWT should be verified with, chosen using the kid header of the JWT.
+
+    Raises a JWTError if the token header is invalid or the key is unknown.
+    """
+    if not signing_keys:
+        return settings.JWT_SECRET.get_secret_value()
+
+    kid = jwt.get_unverified_header(token).get("kid")
+
+    if kid not in signing_keys:
+        msg = "Unknown signing key"
+        raise JWTError(msg)
+
+    return signing_keys[kid].public_key
@@ -0,0 +1,64 @@
+import hashlib
+from datetime import UTC, datetime
+
+from fastapi import Request, Response
+from pydantic import BaseModel
+from starlette.status import HTTP_304_NOT_MODIFIED
+
+from abandonauth.models.auth import JwtClaimsDataDto
+from abandonauth.settings import settings
+
+
+def compute_etag(content: BaseModel) -> str:
+    """
+    Return a strong ETag for the given DTO, computed from its class and field values without serializing it.
+
+    DTOs with equal field values are always serialized to the same body, so the ETag identifies the exact response.
+    """
+    digest = hashlib.sha256(repr(content).encode()).hexdigest()[:32]
+    return f'"{digest}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Return True if the given If-None-Match header matches the ETag, using weak comparison as required by RFC 9110."""
+    if not if_none_match:
+        return False
+
+    if if_none_match.strip() == "*":
+        return True
+
+    return any(x.strip().removeprefix("W/") == etag for x in if_none_match.split(","))
+
+
+def cache_control(token_data: JwtClaimsDataDto, max_age_seconds: int) -> str:
+    """Return the Cache-Control of a response only valid for the given token, never outliving the token."""
+    remaining_seconds = int((token_data.exp - datetime.now(UTC)).total_seconds())
+    max_age = max(min(max_age_seconds, remaining_seconds), 0)
+
+    return f"private, max-age={max_age}"
+
+
+def conditional_response(
+        request: Request,
+        content: BaseModel,
+        token_data: JwtClaimsDataDto,
+        max_age_seconds: int = settings.IDENTITY_CACHE_MAX_AGE_SECONDS,
+) -> Response:
+    """
+    Return the given DTO as JSON with an ETag, or an empty 304 response if the request's If-None-Match matches it.
+
+    The response may only be cached by the client holding the token, for up to max_age_seconds and no longer than the
+    token is valid. Responses that the same client is expected to change should use a max age of 0, so that they are
+    always revalidated.
+    """
+    etag = compute_etag(content)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": cache_control(token_data, max_age_seconds),
+        "Vary": "Authorization",
+    }
+
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=HTTP_304_NOT_MODIFIED, headers=headers)
+
+    return Response(content.model_dump_json(), media_type="application/json", headers=headers)
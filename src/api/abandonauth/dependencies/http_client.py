@@ -0,0 +1,30 @@
+from typing import Annotated
+
+import httpx
+from fastapi import Depends, Request
+
+from abandonauth.settings import settings
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """
+    Create the HTTP client shared by every outbound request to OAuth providers.
+
+    The client keeps connections alive between requests so logins do not pay for a new TCP and TLS handshake.
+    It is created and closed with the app, routes should get it through HttpClientDep.
+    """
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=settings.HTTP_CLIENT_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_CLIENT_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.HTTP_CLIENT_KEEPALIVE_EXPIRY_SECONDS,
+        ),
+    )
+
+
+def get_http_client(request: Request) -> httpx.AsyncClient:
+    """Return the app's shared HTTP client."""
+    return request.app.state.http_client
+
+
+HttpClientDep = Annotated[httpx.AsyncClient, Depends(get_http_client)]
@@ -1,17 +1,41 @@
+from collections.abc import Iterable
+from typing import Literal
+
 from fastapi import HTTPException
-from prisma.models import User
+from prisma.errors import UniqueViolationError
+from prisma.models import CallbackUri, DiscordAccount, GitHubAccount, GoogleAccount, User
 from starlette.status import HTTP_404_NOT_FOUND
 
+from abandonauth.cache import TTLCache, get_worker_local_cache_size
+from abandonauth.database import get_read_client
 from abandonauth.dependencies.auth.jwt import (
     decode_jwt,
     generate_long_lived_jwt,
 )
-from abandonauth.models.auth import JwtClaimsDataDto, JwtDto, ScopeEnum
+from abandonauth.models.auth import JwtClaimsDataDto, JwtDto, ScopeEnum, TokenIntrospectionDto
+from abandonauth.models.user import UserDto, UserIdentity, UserLookupResultDto
+from abandonauth.settings import settings
+
+DEFAULT_CALLBACK_URI_CACHE_MAX_SIZE = 1024
+
+# Callback URIs of recently used developer applications, keyed by developer application ID
+callback_uri_cache: TTLCache[str, frozenset[str]] = TTLCache(
+    max_size=get_worker_local_cache_size(settings.CALLBACK_URI_CACHE_MAX_SIZE, DEFAULT_CALLBACK_URI_CACHE_MAX_SIZE),
+    ttl_seconds=settings.CALLBACK_URI_CACHE_TTL_SECONDS,
+)
+
+OAuthAccountRelation = Literal["discord_account", "github_account", "google_account"]
+
+OAUTH_ACCOUNT_MODELS = {
+    "discord_account": DiscordAccount,
+    "github_account": GitHubAccount,
+    "google_account": GoogleAccount,
+}
 
 
 async def identify_user(user_id: str) -> User:
     """Get the user with the given ID or raise an HTTP 404."""
-    user = await User.prisma().find_unique({
+    user = await User.prisma(get_read_client()).find_unique({
         "id": user_id,
     })
 
@@ -21,7 +45,167 @@ async def identify_user(user_id: str) -> User:
     return user
 
 
-def get_new_token(exchange_token: str, aud: str | None = None) -> JwtDto:
-    """Return a short-term or long-term AbandonAuth JWT from an existing JWT."""
-    token_data: JwtClaimsDataDto = decode_jwt(token=exchange_token, aud=aud, required_scope=ScopeEnum.identify)
-    return JwtDto(token=generate_long_lived_jwt(token_data.user_id, token_data.aud))
+async def get_or_create_oauth_user(
+        account_relation: OAuthAccountRelation,
+        account_id: int | str,
+        username: str,
+) -> User:
+    """
+    Return the user linked to the given OAuth provider account, creating the user and account if they do not exist.
+
+    Returning users are found with a single primary key lookup on the provider account table.
+    New users and their account are created in a single nested insert. If a concurrent login for the same account
+    inserted first, the primary key on the account rejects the insert and the user created by that login is returned.
+    """
+    account_model = OAUTH_ACCOUNT_MODELS[account_relation]
+
+    async def find_linked_user() -> User | None:
+        account = await account_model.prisma().find_unique(  # pyright: ignore [reportAttributeAccessIssue]
+            where={"id": account_id},
+            include={"user": True},
+        )
+        return account.user if account else None
+
+    if user := await find_linked_user():
+        return user
+
+    try:
+        return await User.prisma().create({
+            "username": username,
+            account_relation: {  # pyright: ignore [reportArgumentType]
+                "create": {
+                    "id": account_id,
+                },
+            },
+        })
+    except UniqueViolationError:
+        user = await find_linked_user()
+
+        if user is None:
+            raise
+
+        return user
+
+
+async def get_new_token(exchange_token: str, aud: str | None = None) -> JwtDto:
+    """
+    Return a long-term AbandonAuth JWT from an existing short-term or long-term JWT.
+
+    Short-term exchange tokens are consumed and can not be exchanged again.
+    """
+    token_data: JwtClaimsDataDto = await decode_jwt(
+        token=exchange_token,
+        aud=aud,
+        required_scope=ScopeEnum.identify,
+        consume_exchange_token=True,
+    )
+    return JwtDto(token=await generate_long_lived_jwt(token_data.user_id, token_data.aud))
+
+
+async def lookup_users(user_ids: list[str]) -> UserLookupResultDto:
+    """
+    Get the users with the given IDs using a single query, selecting only the id and username columns.
+
+    Users are returned in the order they were requested, IDs that do not belong to a user are returned in missing_ids.
+    """
+    unique_ids = list(dict.fromkeys(user_ids))
+
+    users = await UserIdentity.prisma(get_read_client()).find_many(
+        where={
+            "id": {"in": unique_ids},
+        },
+    )
+    users_by_id = {x.id: x for x in users}
+
+    return UserLookupResultDto(
+        users=[
+            UserDto(id=users_by_id[x].id, username=users_by_id[x].username)
+            for x in unique_ids
+            if x in users_by_id
+        ],
+        missing_ids=[x for x in unique_ids if x not in users_by_id],
+    )
+
+
+async def introspect_tokens(tokens: list[str], aud: str) -> list[TokenIntrospectionDto]:
+    """
+    Validate each of the given tokens and return their claims and users, in the same order as the given tokens.
+
+    Tokens are decoded individually, then every user is fetched with a single query.
+    Invalid tokens and tokens for users that no longer exist are returned as inactive with the reason in detail.
+    """
+    decoded: list[JwtClaimsDataDto | str] = []
+
+    for token in tokens:
+        try:
+            decoded.append(await decode_jwt(token=token, aud=aud, required_scope=ScopeEnum.identify))
+        except HTTPException as e:
+            decoded.append(e.detail)
+
+    user_ids = list({x.user_id for x in decoded if isinstance(x, JwtClaimsDataDto)})
+    users = await User.prisma(get_read_client()).find_many(
+        where={
+            "id": {"in": user_ids},
+        },
+    ) if user_ids else []
+    users_by_id = {x.id: UserDto(id=x.id, username=x.username) for x in users}
+
+    results = []
+
+    for token_data in decoded:
+        if not isinstance(token_data, JwtClaimsDataDto):
+            results.append(TokenIntrospectionDto(active=False, detail=token_data))
+        elif (user := users_by_id.get(token_data.user_id)) is None:
+            results.append(TokenIntrospectionDto(active=False, claims=token_data, detail="User not found"))
+        else:
+            results.append(TokenIntrospectionDto(active=True, claims=token_data, user=user))
+
+    return results
+
+
+async def get_callback_uris(application_id: str) -> frozenset[str]:
+    """
+    Return the callback URIs of the given developer application.
+
+    Returns an empty set if the application does not exist or has no callback URIs.
+    Results are cached, invalidate_callback_uris must be called when an application's callback URIs change.
+    Callback URIs are read from the primary, a lagging replica would cache URIs that were just removed.
+    """
+    callback_uris = callback_uri_cache.get(application_id)
+
+    if callback_uris is None:
+        # URIs loaded before a concurrent invalidate_callback_uris are not cached
+        generation = callback_uri_cache.generation(application_id)
+        rows = await CallbackUri.prisma().find_many(
+            where={
+                "developer_application_id": application_id,
+            },
+        )
+        callback_uris = frozenset(x.uri for x in rows)
+
+        # Unknown application IDs are not cached, so they can not push valid applications out of the cache
+        if callback_uris:
+            callback_uri_cache.set(application_id, callback_uris, generation=generation)
+
+    return callback_uris
+
+
+def invalidate_callback_uris(application_id: str) -> None:
+    """Remove the cached callback URIs for the given developer application."""
+    callback_uri_cache.invalidate(application_id)
+
+
+def get_callback_uri_changes(
+        existing_callback_uris: Iterable[str],
+        callback_uris: Iterable[str],
+) -> tuple[list[str], list[str]]:
+    """
+    Return the callback URIs to create and to delete so that only the given callback URIs exist for the application.
+
+    Callback URIs that already exist and were given will remain in the database unaltered.
+    Duplicates in the given callback URIs are only created once.
+    """
+    existing = set(existing_callback_uris)
+    requested = dict.fromkeys(callback_uris)
+
+    return [x for x in requested if x not in existing], [x for x in existing if x not in requested]
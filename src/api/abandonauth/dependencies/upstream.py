@@ -0,0 +1,223 @@
+import asyncio
+import math
+import random
+import time
+from dataclasses import dataclass
+from enum import StrEnum
+from typing import Any
+
+import httpx
+from fastapi import HTTPException
+from starlette.status import (
+    HTTP_400_BAD_REQUEST,
+    HTTP_429_TOO_MANY_REQUESTS,
+    HTTP_500_INTERNAL_SERVER_ERROR,
+    HTTP_502_BAD_GATEWAY,
+    HTTP_503_SERVICE_UNAVAILABLE,
+    HTTP_504_GATEWAY_TIMEOUT,
+)
+
+from abandonauth.metrics import upstream_request_duration_seconds
+from abandonauth.settings import settings
+
+# Only requests with these methods are retried, retrying a token exchange would reuse a single-use OAuth code
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD"})
+RETRY_BACKOFF_BASE_SECONDS = 0.1
+
+
+class CircuitState(StrEnum):
+    """States of an upstream provider's circuit breaker."""
+
+    closed = "closed"
+    open = "open"
+    half_open = "half_open"
+
+
+@dataclass(slots=True)
+class UpstreamStats:
+    """Latency and error statistics for the requests made to an upstream provider."""
+
+    requests: int = 0
+    errors: int = 0
+    retries: int = 0
+    rejected: int = 0
+    total_latency_seconds: float = 0.0
+    max_latency_seconds: float = 0.0
+
+    @property
+    def error_rate(self) -> float:
+        """Fraction of requests that failed."""
+        return self.errors / self.requests if self.requests else 0.0
+
+    @property
+    def average_latency_seconds(self) -> float:
+        """Average latency of requests, including failed requests."""
+        return self.total_latency_seconds / self.requests if self.requests else 0.0
+
+
+class UpstreamProvider:
+    """
+    Outbound requests to a single OAuth provider with strict timeouts, bounded retries and a circuit breaker.
+
+    httpx errors, timeouts, 5xx and 429 responses count as failures. After failure_threshold consecutive failures the
+    circuit opens and requests fail fast with a 503 until reset_timeout_seconds pass. A single trial request is then
+    let through, closing the circuit on success or opening it again on failure.
+    """
+
+    def __init__(  # noqa: PLR0913
+            self,
+            name: str,
+            *,
+            timeout: httpx.Timeout,
+            max_retries: int,
+            failure_threshold: int,
+            reset_timeout_seconds: float,
+    ) -> None:
+        self.name = name
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_seconds = reset_timeout_seconds
+        self.stats = UpstreamStats()
+        self._success_duration = upstream_request_duration_seconds.labels(name, "success")
+        self._failure_duration = upstream_request_duration_seconds.labels(name, "failure")
+
+        self._consecutive_failures = 0
+        self._opened_at: float | None = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> CircuitState:
+        """Current state of the circuit breaker."""
+        if self._opened_at is None:
+            return CircuitState.closed
+
+        if time.monotonic() - self._opened_at < self.reset_timeout_seconds:
+            return CircuitState.open
+
+        return CircuitState.half_open
+
+    def _unavailable(self, status_code: int) -> HTTPException:
+        return HTTPException(status_code=status_code, detail=f"{self.name} is currently unavailable")
+
+    def _before_request(self) -> bool:
+        """
+        Raise a 503 if the circuit is open or a half-open trial request is already in flight.
+
+        Return True if the request is the half-open trial request, which must clear _trial_in_flight once it finishes.
+        """
+        state = self.state
+
+        if state == CircuitState.closed:
+            return False
+
+        if state == CircuitState.half_open and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+
+        self.stats.rejected += 1
+        retry_after = self.reset_timeout_seconds - (time.monotonic() - (self._opened_at or 0))
+
+        exception = self._unavailable(HTTP_503_SERVICE_UNAVAILABLE)
+        exception.headers = {"Retry-After": str(max(math.ceil(retry_after), 1))}
+        raise exception
+
+    def _record(self, started_at: float, *, failed: bool) -> None:
+        """Record the outcome of a request and update the circuit breaker."""
+        latency = time.perf_counter() - started_at
+
+        self.stats.requests += 1
+        self.stats.total_latency_seconds += latency
+        self.stats.max_latency_seconds = max(self.stats.max_latency_seconds, latency)
+        (self._failure_duration if failed else self._success_duration).observe(latency)
+
+        if not failed:
+            self._consecutive_failures = 0
+            self._opened_at = None
+            return
+
+        self.stats.errors += 1
+        self._consecutive_failures += 1
+
+        if self._opened_at is not None or self._consecutive_failures >= self.failure_threshold:
+            self._opened_at = time.monotonic()
+
+    async def request(self, http_client: httpx.AsyncClient, method: str, url: str, **kwargs: Any) -> httpx.Response:
+        """
+        Send a request to the provider and return the successful response.
+
+        Idempotent requests are retried with jittered exponential backoff. Raises a 400 if the provider rejected the
+        request, a 502 or 504 if the provider failed, and a 503 if the circuit breaker is open.
+        Cancelled requests, such as a client disconnecting, are not recorded. A cancelled half-open trial request still
+        counts as a failure, reopening the circuit instead of leaving it half-open with a trial that never finishes.
+        """
+        attempts = 1 + (self.max_retries if method in IDEMPOTENT_METHODS else 0)
+
+        for attempt in range(attempts):
+            is_trial = self._before_request()
+            started_at = time.perf_counter()
+
+            try:
+                response = await http_client.request(method, url, timeout=self.timeout, **kwargs)
+            except httpx.HTTPError as e:
+                self._record(started_at, failed=True)
+                error = self._unavailable(
+                    HTTP_504_GATEWAY_TIMEOUT if isinstance(e, httpx.TimeoutException) else HTTP_502_BAD_GATEWAY,
+                )
+                cause: Exception = e
+            except asyncio.CancelledError:
+                # Users abandoning a login say nothing about the provider, only the trial's outcome must be decided
+                if is_trial:
+                    self._record(started_at, failed=True)
+
+                raise
+            else:
+                failed = (response.status_code >= HTTP_500_INTERNAL_SERVER_ERROR
+                          or response.status_code == HTTP_429_TOO_MANY_REQUESTS)
+                self._record(started_at, failed=failed)
+
+                if not response.is_error:
+                    return response
+
+                if not failed:
+                    raise HTTPException(
+                        status_code=HTTP_400_BAD_REQUEST,
+                        detail=f"{self.name} rejected the login request",
+                    )
+
+                error = self._unavailable(HTTP_502_BAD_GATEWAY)
+                cause = httpx.HTTPStatusError(
+                    f"{self.name} responded with {response.status_code}",
+                    request=response.request,
+                    response=response,
+                )
+            finally:
+                # Any outcome, including unexpected exceptions, must let the next trial request through
+                if is_trial:
+                    self._trial_in_flight = False
+
+            if attempt + 1 == attempts:
+                raise error from cause
+
+            self.stats.retries += 1
+            await asyncio.sleep(random.uniform(0, RETRY_BACKOFF_BASE_SECONDS * 2 ** attempt))  # noqa: S311
+
+        # The loop always returns or raises on its last attempt
+        raise self._unavailable(HTTP_502_BAD_GATEWAY)
+
+
+def _create_upstream_provider(name: str, read_timeout_seconds: float) -> UpstreamProvider:
+    return UpstreamProvider(
+        name,
+        timeout=httpx.Timeout(read_timeout_seconds, connect=settings.UPSTREAM_CONNECT_TIMEOUT_SECONDS),
+        max_retries=settings.UPSTREAM_MAX_RETRIES,
+        failure_threshold=settings.UPSTREAM_CIRCUIT_FAILURE_THRESHOLD,
+        reset_timeout_seconds=settings.UPSTREAM_CIRCUIT_RESET_SECONDS,
+    )
+
+
+discord_upstream = _create_upstream_provider("Discord", settings.DISCORD_HTTP_TIMEOUT_SECONDS)
+github_upstream = _create_upstream_provider("GitHub", settings.GITHUB_HTTP_TIMEOUT_SECONDS)
+google_upstream = _create_upstream_provider("Google", settings.GOOGLE_HTTP_TIMEOUT_SECONDS)
+
+upstream_providers = [discord_upstream, github_upstream, google_upstream]
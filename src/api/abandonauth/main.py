@@ -1,20 +1,79 @@
+import asyncio
+import logging
 import tomllib
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
 from pathlib import Path
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from abandonauth.database import prisma_db
+from abandonauth.database import prisma_db, replica_db
+from abandonauth.dependencies.auth.hash import hash_executor
+from abandonauth.dependencies.auth.revocation import revocation_list
+from abandonauth.dependencies.http_client import create_http_client
+from abandonauth.metrics import MetricsMiddleware
+from abandonauth.profiling import ProfilingMiddleware
 from abandonauth.routers import routers
 from abandonauth.settings import settings
+from abandonauth.warm_up import readiness, warm_up
 
 with Path("../pyproject.toml").open("rb") as f:
     pyproject = tomllib.load(f)
 
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """
+    Connect prisma to the database and its replica and open the shared HTTP client, then warm up in the background.
+
+    The server accepts requests as soon as this yields, /health/ready reports when warm-up completes.
+    The token revocation list is kept up to date by a background task.
+    On shutdown the worker reports as not ready, then disconnects prisma, closes the HTTP client and stops the hashing
+    threads.
+    The replica is optional, if it can not be connected to the worker starts anyway and reads from the primary.
+    """
+    await prisma_db.connect()
+
+    if replica_db is not None:
+        try:
+            await replica_db.connect()
+        except Exception:
+            logger.exception("Could not connect to the read replica, reads will use the primary database")
+
+    app.state.http_client = create_http_client()
+    revocation_task = asyncio.create_task(revocation_list.run())
+
+    if settings.WARM_UP_ENABLED:
+        warm_up_task = asyncio.create_task(warm_up(app))
+    else:
+        warm_up_task = None
+        readiness.ready = True
+
+    yield
+
+    readiness.ready = False
+    revocation_task.cancel()
+
+    if warm_up_task is not None:
+        warm_up_task.cancel()
+
+    for client in (prisma_db, replica_db):
+        if client is not None and client.is_connected():
+            await client.disconnect()
+
+    await app.state.http_client.aclose()
+
+    hash_executor.shutdown(wait=False, cancel_futures=True)
+
+
 app = FastAPI(
     title="AbandonAuth",
     version=pyproject["tool"]["poetry"]["version"],
-    root_path="/api"
+    root_path="/api",
+    lifespan=lifespan,
 )
 
 allowed_origins = [settings.ABANDON_AUTH_SITE_URL]
@@ -30,18 +89,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-for router in routers:
-    app.include_router(router)
+# Only added when enabled, so that profiling costs nothing otherwise
+if settings.PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
 
+# Added last so that it is the outermost middleware and its latencies include the other middleware
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
 
-@app.on_event("startup")
-async def startup() -> None:
-    """On startup connect prisma to the database."""
-    await prisma_db.connect()
-
-
-@app.on_event("shutdown")
-async def shutdown() -> None:
-    """On shutdown disconnect prisma from the database."""
-    if prisma_db.is_connected():
-        await prisma_db.disconnect()
+for router in routers:
+    app.include_router(router)
@@ -0,0 +1,395 @@
+import bisect
+import math
+import time
+from abc import ABC, abstractmethod
+from collections.abc import Iterator, Sequence
+from typing import ClassVar, Generic, TypeVar
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+C = TypeVar("C")
+
+# Upper bounds in seconds, from cheap in-memory work up to slow upstream OAuth providers
+DEFAULT_LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Route label for requests that did not match a route, so that unknown paths can not create new label values
+UNMATCHED_ROUTE = "unmatched"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+
+    return repr(float(value))
+
+
+def _format_labels(label_names: Sequence[str], label_values: Sequence[str]) -> str:
+    if not label_names:
+        return ""
+
+    escaped = (x.replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"") for x in label_values)
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(label_names, escaped, strict=True)) + "}"
+
+
+class CounterChild:
+    """A monotonically increasing value for a single set of label values."""
+
+    __slots__ = ("value",)
+
+    def __init__(self) -> None:
+        self.value = 0.0
+
+    def inc(self, amount: float = 1) -> None:
+        """Increase the counter by the given amount."""
+        self.value += amount
+
+    def set_total(self, value: float) -> None:
+        """Set the counter to a total that is already tracked elsewhere, such as the hit count of a cache."""
+        self.value = value
+
+
+class GaugeChild:
+    """A value that can go up and down for a single set of label values."""
+
+    __slots__ = ("value",)
+
+    def __init__(self) -> None:
+        self.value = 0.0
+
+    def set(self, value: float) -> None:
+        """Set the gauge to the given value."""
+        self.value = value
+
+    def inc(self, amount: float = 1) -> None:
+        """Increase the gauge by the given amount."""
+        self.value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        """Decrease the gauge by the given amount."""
+        self.value -= amount
+
+
+class HistogramChild:
+    """Bucketed observations for a single set of label values. Buckets are allocated once, when the child is created."""
+
+    __slots__ = ("bucket_counts", "count", "sum", "upper_bounds")
+
+    def __init__(self, upper_bounds: tuple[float, ...]) -> None:
+        self.upper_bounds = upper_bounds
+        # The last bucket counts observations larger than every upper bound, the +Inf bucket
+        self.bucket_counts = [0] * (len(upper_bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        """Record an observation."""
+        self.bucket_counts[bisect.bisect_left(self.upper_bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+
+class _Metric(ABC, Generic[C]):
+    """A named metric with one child per set of label values."""
+
+    type_name: ClassVar[str]
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._children: dict[tuple[str, ...], C] = {}
+
+    @abstractmethod
+    def _create_child(self) -> C:
+        """Create the child for a new set of label values."""
+
+    def labels(self, *label_values: str) -> C:
+        """
+        Return the child for the given label values, creating it on first use.
+
+        Hot paths should look their children up once and keep them, rather than calling this for every observation.
+        """
+        child = self._children.get(label_values)
+
+        if child is None:
+            if len(label_values) != len(self.label_names):
+                msg = f"{self.name} expects the labels {self.label_names}, got {label_values}"
+                raise ValueError(msg)
+
+            child = self._children[label_values] = self._create_child()
+
+        return child
+
+    def _render_child(self, label_values: tuple[str, ...], child: C) -> Iterator[str]:
+        yield f"{self.name}{_format_labels(self.label_names, label_values)} {_format_value(child.value)}"  # pyright: ignore [reportAttributeAccessIssue]
+
+    def render(self) -> Iterator[str]:
+        """Yield the lines of the Prometheus text exposition format for this metric."""
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.type_name}"
+
+        for label_values, child in list(self._children.items()):
+            yield from self._render_child(label_values, child)
+
+
+class Counter(_Metric[CounterChild]):
+    """A metric whose values only increase."""
+
+    type_name = "counter"
+
+    def _create_child(self) -> CounterChild:  # noqa: PLR6301
+        return CounterChild()
+
+
+class Gauge(_Metric[GaugeChild]):
+    """A metric whose values can go up and down."""
+
+    type_name = "gauge"
+
+    def _create_child(self) -> GaugeChild:  # noqa: PLR6301
+        return GaugeChild()
+
+
+class Histogram(_Metric[HistogramChild]):
+    """A metric counting observations into buckets."""
+
+    type_name = "histogram"
+
+    def __init__(
+            self,
+            name: str,
+            documentation: str,
+            label_names: Sequence[str] = (),
+            buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, label_names)
+        self.upper_bounds = tuple(sorted(buckets))
+
+    def _create_child(self) -> HistogramChild:
+        return HistogramChild(self.upper_bounds)
+
+    def _render_child(self, label_values: tuple[str, ...], child: HistogramChild) -> Iterator[str]:
+        label_names = (*self.label_names, "le")
+        cumulative_count = 0
+
+        for upper_bound, bucket_count in zip((*child.upper_bounds, math.inf), child.bucket_counts, strict=True):
+            cumulative_count += bucket_count
+            labels = _format_labels(label_names, (*label_values, _format_value(upper_bound)))
+            yield f"{self.name}_bucket{labels} {cumulative_count}"
+
+        labels = _format_labels(self.label_names, label_values)
+        yield f"{self.name}_sum{labels} {_format_value(child.sum)}"
+        yield f"{self.name}_count{labels} {child.count}"
+
+
+class MetricsRegistry:
+    """The metrics exposed by the /metrics endpoint."""
+
+    def __init__(self) -> None:
+        self._metrics: list[_Metric] = []
+
+    def counter(self, name: str, documentation: str, label_names: Sequence[str] = ()) -> Counter:
+        """Create and register a counter."""
+        metric = Counter(name, documentation, label_names)
+        self._metrics.append(metric)
+        return metric
+
+    def gauge(self, name: str, documentation: str, label_names: Sequence[str] = ()) -> Gauge:
+        """Create and register a gauge."""
+        metric = Gauge(name, documentation, label_names)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(
+            self,
+            name: str,
+            documentation: str,
+            label_names: Sequence[str] = (),
+            buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+    ) -> Histogram:
+        """Create and register a histogram."""
+        metric = Histogram(name, documentation, label_names, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Return every registered metric in the Prometheus text exposition format."""
+        return "\n".join(line for metric in self._metrics for line in metric.render()) + "\n"
+
+
+metrics_registry = MetricsRegistry()
+
+http_requests_in_flight = metrics_registry.gauge(
+    "abandonauth_http_requests_in_flight",
+    "Number of HTTP requests currently being handled.",
+).labels()
+http_request_duration_seconds = metrics_registry.histogram(
+    "abandonauth_http_request_duration_seconds",
+    "Time taken to handle HTTP requests, by route template.",
+    ("method", "route"),
+)
+http_responses_total = metrics_registry.counter(
+    "abandonauth_http_responses_total",
+    "Number of HTTP responses sent, by route template and status code.",
+    ("method", "route", "status"),
+)
+
+hash_duration_seconds = metrics_registry.histogram(
+    "abandonauth_hash_duration_seconds",
+    "Time spent running bcrypt in the hashing thread pool, excluding time waiting for a thread.",
+    ("operation",),
+)
+bcrypt_verify_duration = hash_duration_seconds.labels("verify")
+bcrypt_hash_duration = hash_duration_seconds.labels("hash")
+hash_pool_wait_seconds = metrics_registry.histogram(
+    "abandonauth_hash_pool_wait_seconds",
+    "Time hashing jobs waited for a free thread in the hashing thread pool.",
+).labels()
+
+prisma_query_duration_seconds = metrics_registry.histogram(
+    "abandonauth_prisma_query_duration_seconds",
+    "Time taken by Prisma queries, by database, model and query method. Batched queries are not included.",
+    ("database", "model", "method"),
+)
+
+database_pool_size = metrics_registry.gauge(
+    "abandonauth_database_pool_size",
+    "Maximum number of database connections this worker may open.",
+).labels()
+database_timeouts_total = metrics_registry.counter(
+    "abandonauth_database_timeouts_total",
+    "Number of Prisma queries that timed out waiting for a pooled connection, or waiting for the database to answer.",
+    ("kind",),
+)
+database_pool_timeouts = database_timeouts_total.labels("pool")
+database_query_timeouts = database_timeouts_total.labels("query")
+
+upstream_request_duration_seconds = metrics_registry.histogram(
+    "abandonauth_upstream_request_duration_seconds",
+    "Time taken by requests to upstream OAuth providers, by provider and outcome.",
+    ("provider", "outcome"),
+)
+upstream_circuit_open = metrics_registry.gauge(
+    "abandonauth_upstream_circuit_open",
+    "1 if the circuit breaker of the upstream OAuth provider is open or half-open, otherwise 0.",
+    ("provider",),
+)
+
+jwt_duration_seconds = metrics_registry.histogram(
+    "abandonauth_jwt_duration_seconds",
+    "Time taken to sign or verify JWTs, cached decodes are not included.",
+    ("operation",),
+)
+jwt_encode_duration = jwt_duration_seconds.labels("encode")
+jwt_decode_duration = jwt_duration_seconds.labels("decode")
+
+cache_entries = metrics_registry.gauge(
+    "abandonauth_cache_entries",
+    "Number of entries held by each in-process cache.",
+    ("cache",),
+)
+cache_hits_total = metrics_registry.counter(
+    "abandonauth_cache_hits_total",
+    "Number of lookups served by each in-process cache.",
+    ("cache",),
+)
+cache_misses_total = metrics_registry.counter(
+    "abandonauth_cache_misses_total",
+    "Number of lookups not served by each in-process cache.",
+    ("cache",),
+)
+cache_evictions_total = metrics_registry.counter(
+    "abandonauth_cache_evictions_total",
+    "Number of entries evicted from each in-process cache because it was full.",
+    ("cache",),
+)
+exchange_token_store_entries = metrics_registry.gauge(
+    "abandonauth_exchange_token_store_entries",
+    "Number of unexchanged tokens held by the in-memory exchange token store.",
+).labels()
+exchange_token_store_evictions_total = metrics_registry.counter(
+    "abandonauth_exchange_token_store_evictions_total",
+    "Number of tokens evicted from the in-memory exchange token store, by reason.",
+    ("reason",),
+)
+revocation_list_entries = metrics_registry.gauge(
+    "abandonauth_revocation_list_entries",
+    "Number of revoked tokens, and of users whose earlier tokens are revoked, held by the in-memory revocation list.",
+    ("kind",),
+)
+hash_pool_pending = metrics_registry.gauge(
+    "abandonauth_hash_pool_pending",
+    "Number of hashing jobs running or waiting in the hashing thread pool.",
+).labels()
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording the number of in-flight requests, and the latency and status of requests per route.
+
+    Requests are labelled with the route template rather than the path, so path parameters do not create new labels.
+    The metric children of each route are looked up once and kept, so recording a request allocates no labels.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+        self._durations: dict[str, dict[str, HistogramChild]] = {}
+        self._responses: dict[str, dict[str, dict[int, CounterChild]]] = {}
+
+    def _observe(self, method: str, route: str, status_code: int, duration: float) -> None:
+        # Dictionaries are only created on a miss, setdefault would build a new one for every request
+        durations = self._durations.get(method)
+        if durations is None:
+            durations = self._durations[method] = {}
+
+        duration_child = durations.get(route)
+        if duration_child is None:
+            duration_child = durations[route] = http_request_duration_seconds.labels(method, route)
+
+        responses_by_route = self._responses.get(method)
+        if responses_by_route is None:
+            responses_by_route = self._responses[method] = {}
+
+        responses = responses_by_route.get(route)
+        if responses is None:
+            responses = responses_by_route[route] = {}
+
+        response_child = responses.get(status_code)
+        if response_child is None:
+            response_child = responses[status_code] = http_responses_total.labels(method, route, str(status_code))
+
+        duration_child.observe(duration)
+        response_child.inc()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Handle the request with the wrapped app, recording its metrics once the response has been sent."""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # Requests that fail before a response is started are reported as a 500 by Starlette's error middleware
+        status_code = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+
+            await send(message)
+
+        http_requests_in_flight.inc()
+        started_at = time.perf_counter()
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            http_requests_in_flight.dec()
+
+            # The router sets the matched route on the scope, which is shared with this middleware
+            route = scope.get("route")
+            self._observe(
+                scope["method"],
+                getattr(route, "path", UNMATCHED_ROUTE),
+                status_code,
+                time.perf_counter() - started_at,
+            )
@@ -1,4 +1,4 @@
-from abandonauth.models.auth import JwtDto
+from abandonauth.models.auth import JwksDto, JwtDto
 from abandonauth.models.developer_application import (
     CallbackUriDto,
     CreateCallbackUriDto,
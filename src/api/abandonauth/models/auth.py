@@ -1,7 +1,9 @@
 from datetime import datetime
 from enum import StrEnum
 
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
+
+from abandonauth.models.user import UserDto
 
 
 class JwtDto(BaseModel):
@@ -10,6 +12,12 @@ class JwtDto(BaseModel):
     token: str
 
 
+class JwksDto(BaseModel):
+    """JSON Web Key Set containing the public keys used to verify AbandonAuth JWTs."""
+
+    keys: list[dict[str, str]]
+
+
 class ScopeEnum(StrEnum):
     """All accepted scopes for an abandonauth JWT."""
 
@@ -28,8 +36,29 @@ class LifespanEnum(StrEnum):
 class JwtClaimsDataDto(BaseModel):
     """All claim data for an Abandon Auth JWT."""
 
+    # Decoded claims are cached and shared between requests, so they must not be modified
+    model_config = ConfigDict(frozen=True)
+
     user_id: str
     exp: datetime
     scope: str
     aud: str
     lifespan: LifespanEnum
+    # Only missing from tokens issued before revocation was supported
+    jti: str | None = None
+    iat: datetime | None = None
+
+
+class IntrospectBatchDto(BaseModel):
+    """Tokens to validate in a single request."""
+
+    tokens: list[str]
+
+
+class TokenIntrospectionDto(BaseModel):
+    """Validity, claims and user for a single introspected token."""
+
+    active: bool
+    claims: JwtClaimsDataDto | None = None
+    user: UserDto | None = None
+    detail: str | None = None
@@ -1,5 +1,6 @@
 from uuid import UUID
 
+from prisma.bases import BaseCallbackUri, BaseDeveloperApplication
 from pydantic import BaseModel
 
 
@@ -17,6 +18,26 @@ class DeveloperApplicationDto(BaseModel):
     owner_id: str
 
 
+class DeveloperApplicationSummary(BaseDeveloperApplication):
+    """Developer application projection used to list applications without fetching their refresh token hash."""
+
+    id: str
+    name: str
+    owner_id: str
+
+
+class CallbackUriValue(BaseCallbackUri):
+    """Callback URI projection selecting only the URI."""
+
+    uri: str
+
+
+class DeveloperApplicationWithCallbackUris(DeveloperApplicationSummary):
+    """Developer application projection with the values of its callback URIs, when they are included."""
+
+    callback_uris: list[CallbackUriValue] | None = None
+
+
 class DeveloperApplicationWithCallbackUriDto(DeveloperApplicationDto):
     """Basic data for developer applications as well as the Callback URIs for the app."""
 
@@ -0,0 +1,8 @@
+from pydantic import BaseModel
+
+
+class ReadinessDto(BaseModel):
+    """Whether the worker can serve traffic, and how long its warm-up on startup took."""
+
+    ready: bool
+    warm_up_seconds: float | None = None
@@ -1,5 +1,6 @@
 from uuid import UUID
 
+from prisma.bases import BaseUser
 from pydantic import BaseModel
 
 
@@ -10,6 +11,26 @@ class UserDto(BaseModel):
     username: str
 
 
+class UserLookupDto(BaseModel):
+    """IDs of the users to look up in a single request."""
+
+    ids: list[UUID]
+
+
+class UserLookupResultDto(BaseModel):
+    """Users that were found and the requested IDs that do not belong to any user."""
+
+    users: list[UserDto]
+    missing_ids: list[str]
+
+
+class UserIdentity(BaseUser):
+    """User projection used to fetch only the fields in UserDto from the database."""
+
+    id: str
+    username: str
+
+
 class UserAuthInfo(BaseModel):
     """User info and authorization info."""
 
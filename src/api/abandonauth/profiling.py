@@ -0,0 +1,202 @@
+import asyncio
+import hmac
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from types import FrameType
+from typing import Any
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from abandonauth.metrics import UNMATCHED_ROUTE
+from abandonauth.settings import settings
+
+# Requests carrying this header with the admin token are always profiled
+PROFILE_HEADER = b"x-abandonauth-profile"
+
+# Leaf frame recorded while a request is suspended awaiting a future, such as a Prisma query or a hashing thread
+AWAITING_FRAME = "<awaiting>"
+
+
+def _frame_name(frame: FrameType) -> str:
+    return f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_qualname}"
+
+
+def _running_stack(root: FrameType, thread_id: int) -> list[FrameType]:
+    """Return the frames of the given thread from the root frame to the currently executing frame."""
+    frame = sys._current_frames().get(thread_id)  # noqa: SLF001
+    stack = []
+
+    while frame is not None:
+        stack.append(frame)
+
+        if frame is root:
+            stack.reverse()
+            return stack
+
+        frame = frame.f_back
+
+    return []
+
+
+def _task_stack(task: asyncio.Task, thread_id: int) -> str | None:
+    """
+    Return the current stack of the task in folded format, outermost frame first, or None if it has no stack.
+
+    While the task is running its stack is read from the event loop thread. While it is suspended, the chain of
+    coroutines it is awaiting is followed instead, ending with AWAITING_FRAME.
+    """
+    coroutine: Any = task.get_coro()
+    root = getattr(coroutine, "cr_frame", None)
+
+    if root is None:
+        return None
+
+    if coroutine.cr_running:
+        frames = _running_stack(root, thread_id)
+        return ";".join(_frame_name(x) for x in frames) if frames else None
+
+    names = []
+    awaitable = coroutine
+
+    while (frame := getattr(awaitable, "cr_frame", None)) is not None:
+        names.append(_frame_name(frame))
+        awaitable = awaitable.cr_await
+
+    names.append(AWAITING_FRAME)
+    return ";".join(names)
+
+
+@dataclass(slots=True)
+class _ActiveProfile:
+    task: asyncio.Task
+    thread_id: int
+    samples: Counter[str] = field(default_factory=Counter)
+
+
+class SamplingProfiler:
+    """
+    Samples the stacks of the requests being profiled from a background thread.
+
+    The thread is only started once the first request is profiled.
+    """
+
+    def __init__(self, interval_seconds: float) -> None:
+        self.interval_seconds = interval_seconds
+        self._active: dict[int, _ActiveProfile] = {}
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+
+    def start(self, task: asyncio.Task, thread_id: int) -> _ActiveProfile:
+        """Start sampling the given task, running on the event loop in the given thread."""
+        profile = _ActiveProfile(task=task, thread_id=thread_id)
+
+        with self._lock:
+            self._active[id(profile)] = profile
+
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="abandonauth-profiler", daemon=True)
+                self._thread.start()
+
+        return profile
+
+    def stop(self, profile: _ActiveProfile) -> Counter[str]:
+        """Stop sampling the given profile and return the number of samples of each folded stack."""
+        with self._lock:
+            del self._active[id(profile)]
+
+        return profile.samples
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.interval_seconds)
+
+            with self._lock:
+                for profile in self._active.values():
+                    # Frames can change underneath the sampler, a failed sample is skipped rather than stopping it
+                    try:
+                        stack = _task_stack(profile.task, profile.thread_id)
+                    except (AttributeError, RuntimeError):
+                        continue
+
+                    if stack:
+                        profile.samples[stack] += 1
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware profiling a fraction of requests, and requests carrying the admin profiling header.
+
+    Samples are aggregated per route and written as folded stacks to "<route>.folded" files in the output directory,
+    ready for flamegraph.pl, speedscope or inferno. Each file is rewritten with the totals so far after every profiled
+    request to its route. Files are written by a single background thread, in order, so the event loop never waits on
+    the disk.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+        self.sample_rate = settings.PROFILING_SAMPLE_RATE
+        self.output_dir = Path(settings.PROFILING_OUTPUT_DIR)
+        self.profiler = SamplingProfiler(settings.PROFILING_INTERVAL_SECONDS)
+        self._route_samples: dict[str, Counter[str]] = {}
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="abandonauth-profile-writer")
+
+        admin_token = settings.PROFILING_ADMIN_TOKEN
+        self._admin_token = admin_token.get_secret_value().encode() if admin_token else b""
+
+    def _should_profile(self, scope: Scope) -> bool:
+        if self.sample_rate and random.random() < self.sample_rate:  # noqa: S311
+            return True
+
+        if self._admin_token:
+            for name, value in scope["headers"]:
+                if name == PROFILE_HEADER:
+                    return hmac.compare_digest(value, self._admin_token)
+
+        return False
+
+    def _write_folded_file(self, route_name: str, route_samples: Counter[str]) -> None:
+        """Write the given samples of a route to its folded stacks file, run in the writer thread."""
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        file_name = re.sub(r"[^A-Za-z0-9]+", "_", route_name).strip("_")
+        (self.output_dir / f"{file_name}.folded").write_text(
+            "".join(f"{stack} {count}\n" for stack, count in route_samples.most_common()),
+        )
+
+    async def _write_route_samples(self, route_name: str, samples: Counter[str]) -> None:
+        route_samples = self._route_samples.get(route_name)
+        if route_samples is None:
+            route_samples = self._route_samples[route_name] = Counter()
+
+        route_samples.update(samples)
+
+        # The writer thread gets a copy, as the totals keep changing on the event loop while it writes
+        await asyncio.get_running_loop().run_in_executor(
+            self._writer,
+            self._write_folded_file,
+            route_name,
+            route_samples.copy(),
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Handle the request with the wrapped app, profiling it if it was selected."""
+        task = asyncio.current_task()
+
+        if scope["type"] != "http" or task is None or not self._should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile = self.profiler.start(task, threading.get_ident())
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            samples = self.profiler.stop(profile)
+            route = getattr(scope.get("route"), "path", UNMATCHED_ROUTE)
+            await self._write_route_samples(f"{scope['method']} {route}", samples)
@@ -2,8 +2,11 @@ from abandonauth.routers.developer_application import router as developer_router
 from abandonauth.routers.discord import router as discord_router
 from abandonauth.routers.github import router as github_router
 from abandonauth.routers.google import router as google_router
+from abandonauth.routers.health import router as health_router
 from abandonauth.routers.index import router as index_router
+from abandonauth.routers.metrics import router as metrics_router
 from abandonauth.routers.password_login import router as password_login_router
+from abandonauth.routers.profiling import router as profiling_router
 from abandonauth.routers.ui import router as ui_router
 from abandonauth.settings import settings
 
@@ -12,9 +15,16 @@ routers = [
     discord_router,
     github_router,
     google_router,
+    health_router,
     index_router,
     ui_router,
 ]
 
+if settings.METRICS_ENABLED:
+    routers.append(metrics_router)
+
+if settings.PROFILING_ENABLED:
+    routers.append(profiling_router)
+
 if settings.DEBUG:
     routers.append(password_login_router)
@@ -1,18 +1,22 @@
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from prisma.models import CallbackUri, DeveloperApplication
-from starlette.status import HTTP_401_UNAUTHORIZED, HTTP_404_NOT_FOUND
+from starlette.status import HTTP_400_BAD_REQUEST, HTTP_401_UNAUTHORIZED, HTTP_404_NOT_FOUND
 
-from abandonauth.database import prisma_db
+from abandonauth.database import get_read_client, prisma_db
+from abandonauth.dependencies.auth.developer_application_deps import (
+    authenticate_developer_application,
+    invalidate_developer_application_credentials,
+)
 from abandonauth.dependencies.auth.hash import (
     generate_refresh_token,
-    get_hashed_data,
-    verify_data,
+    get_refresh_token_hash,
 )
 from abandonauth.dependencies.auth.jwt import DeveloperAppJwtBearer, JWTBearer, generate_long_lived_jwt
+from abandonauth.dependencies.conditional import conditional_response
+from abandonauth.dependencies.services import get_callback_uri_changes, invalidate_callback_uris
 from abandonauth.models import (
-    CreateCallbackUriDto,
     CreateDeveloperApplicationDto,
     DeveloperApplicationDto,
     DeveloperApplicationName,
@@ -21,6 +25,7 @@ from abandonauth.models import (
     LoginDeveloperApplicationDto,
 )
 from abandonauth.models.auth import JwtClaimsDataDto
+from abandonauth.models.developer_application import DeveloperApplicationWithCallbackUris
 from abandonauth.settings import settings
 
 router = APIRouter(
@@ -45,7 +50,7 @@ async def create_developer_application(
     Returns the permanent refresh token for the account. This token can only be manually changed.
     """
     refresh_token = generate_refresh_token()
-    hashed_token = get_hashed_data(refresh_token)
+    hashed_token = get_refresh_token_hash(refresh_token)
 
     dev_app = await DeveloperApplication.prisma().create({
         "owner_id": token_data.user_id,
@@ -69,19 +74,15 @@ async def login_developer_application(login_data: LoginDeveloperApplicationDto)
 
     Returns a short-lived exchange token for the developer application.
     """
-    dev_app = await DeveloperApplication.prisma().find_unique(
-        {
-            "id": str(login_data.id),
-        },
-    )
+    dev_app = await authenticate_developer_application(login_data.id, login_data.refresh_token)
 
-    if not dev_app or not verify_data(login_data.refresh_token, dev_app.refresh_token):
+    if not dev_app:
         raise HTTPException(
             status_code=HTTP_401_UNAUTHORIZED,
             detail="Invalid username or refresh token",
         )
 
-    return JwtDto(token=generate_long_lived_jwt(dev_app.id, settings.ABANDON_AUTH_DEVELOPER_APP_ID))
+    return JwtDto(token=await generate_long_lived_jwt(dev_app.id, settings.ABANDON_AUTH_DEVELOPER_APP_ID))
 
 
 @router.delete(
@@ -103,6 +104,8 @@ async def delete_developer_application(
         deleted = await DeveloperApplication.prisma().delete({
             "id": dev_app.id,
         })
+        invalidate_developer_application_credentials(dev_app.id)
+        invalidate_callback_uris(dev_app.id)
 
         # It should not be possible for this condition to fail. Adding for Pyright
         if deleted:
@@ -132,7 +135,7 @@ async def change_application_refresh_token(
 
     if dev_app and token_data.user_id == dev_app.owner_id:
         refresh_token = generate_refresh_token()
-        hashed_token = get_hashed_data(refresh_token)
+        hashed_token = get_refresh_token_hash(refresh_token)
 
         updated = await DeveloperApplication.prisma().update(
             where={
@@ -142,6 +145,7 @@ async def change_application_refresh_token(
                 "refresh_token": hashed_token,
             },
         )
+        invalidate_developer_application_credentials(dev_app.id)
 
         # It should not be possible for this condition to fail. Adding for Pyright
         if updated:
@@ -158,21 +162,27 @@ async def change_application_refresh_token(
     response_model=DeveloperApplicationDto,
 )
 async def current_developer_application_information(
+        request: Request,
         token_data: JwtClaimsDataDto = Depends(DeveloperAppJwtBearer()),
-) -> DeveloperApplicationDto:
+) -> Response:
     """
     Get information about the developer application from a jwt.
 
+    Supports conditional requests with If-None-Match.
     This function must be defined before other endpoints that use path params at the same path
     """
-    dev_app = await DeveloperApplication.prisma().find_unique({
+    dev_app = await DeveloperApplication.prisma(get_read_client()).find_unique({
         "id": token_data.user_id,
     })
 
     if dev_app is None:
         raise HTTPException(status_code=HTTP_404_NOT_FOUND)
 
-    return DeveloperApplicationDto(id=dev_app.id, owner_id=dev_app.owner_id, name=dev_app.name)
+    return conditional_response(
+        request,
+        DeveloperApplicationDto(id=dev_app.id, owner_id=dev_app.owner_id, name=dev_app.name),
+        token_data,
+    )
 
 
 @router.get(
@@ -182,11 +192,17 @@ async def current_developer_application_information(
     response_model=DeveloperApplicationWithCallbackUriDto,
 )
 async def get_developer_application(
+        request: Request,
         application_id: UUID,
         token_data: JwtClaimsDataDto = Depends(JWTBearer()),
-) -> DeveloperApplicationWithCallbackUriDto:
-    """Get information about the given developer application if the requesting user owns the developer app."""
-    dev_app = await DeveloperApplication.prisma().find_unique(
+) -> Response:
+    """
+    Get information about the given developer application if the requesting user owns the developer app.
+
+    Supports conditional requests with If-None-Match. Callback URIs are sorted, so that their order does not change the
+    ETag. The response is always revalidated, as the owner reads it again right after editing the application.
+    """
+    dev_app = await DeveloperApplication.prisma(get_read_client()).find_unique(
         where={"id": str(application_id)},
         include={"callback_uris": True},
     )
@@ -194,13 +210,18 @@ async def get_developer_application(
     if not (dev_app and token_data.user_id == dev_app.owner_id):
         raise HTTPException(status_code=HTTP_404_NOT_FOUND)
 
-    callbacks = [x.uri for x in dev_app.callback_uris] if dev_app.callback_uris else []
-
-    return DeveloperApplicationWithCallbackUriDto(
-        id=dev_app.id,
-        owner_id=dev_app.owner_id,
-        name=dev_app.name,
-        callback_uris=callbacks,
+    callbacks = sorted(x.uri for x in dev_app.callback_uris) if dev_app.callback_uris else []
+
+    return conditional_response(
+        request,
+        DeveloperApplicationWithCallbackUriDto(
+            id=dev_app.id,
+            owner_id=dev_app.owner_id,
+            name=dev_app.name,
+            callback_uris=callbacks,
+        ),
+        token_data,
+        max_age_seconds=0,
     )
 
 
@@ -221,8 +242,18 @@ async def update_developer_application_callback_uris(
     Create all callback URIs that do not exist yet.
     Delete all callback URIs that already exist and were not given in this request.
     Callback URIs that already exist and were given in this request will remain in the database unaltered.
+    Duplicate callback URIs in the request are only stored once.
     """
-    dev_app = await DeveloperApplication.prisma().find_unique(
+    unique_callback_uris = list(dict.fromkeys(callback_uris))
+
+    if len(unique_callback_uris) > settings.CALLBACK_URI_MAX_PER_APPLICATION:
+        raise HTTPException(
+            status_code=HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.CALLBACK_URI_MAX_PER_APPLICATION} callback URIs can be set",
+        )
+
+    # Only the owner and the URI column of the callback URIs are fetched, not the refresh token hash or URI IDs
+    dev_app = await DeveloperApplicationWithCallbackUris.prisma().find_unique(
         where={"id": str(application_id)},
         include={"callback_uris": True},
     )
@@ -230,33 +261,29 @@ async def update_developer_application_callback_uris(
     if not (dev_app and token_data.user_id == dev_app.owner_id):
         raise HTTPException(status_code=HTTP_404_NOT_FOUND)
 
-    if dev_app.callback_uris:
-        existing_callback_uris: dict[str, CallbackUri] = {x.uri: x for x in dev_app.callback_uris}
-    else:
-        existing_callback_uris = {}
-
-    # Gather URIs that do not exist yet and stage them for creation
-    callback_uris_to_create: list[CreateCallbackUriDto] = []
-
-    for uri in callback_uris:
-        if uri not in existing_callback_uris:
-            to_create = CreateCallbackUriDto(developer_application_id=dev_app.id, uri=uri)
-            callback_uris_to_create.append(to_create)
-
-    # Gather URIs that already exist and were not specified in the request and stage them for deletion
-    uris_to_delete = [
-        existing_callback_uris[delete_uri]
-        for delete_uri in existing_callback_uris
-        if delete_uri not in callback_uris
-    ]
-
-    # Batch the creation of new URIs and the deletion of URIs that were not given in the request
-    # Only URIs that were passed into the request should exist after the entire exchange is done
-    async with prisma_db.batch_() as batcher:
-        for create_uri in callback_uris_to_create:
-            batcher.callbackuri.create(dict(create_uri))  # pyright: ignore [reportArgumentType]
-
-        for delete_uri in uris_to_delete:
-            batcher.callbackuri.delete(where={"id": delete_uri.id})
+    uris_to_create, uris_to_delete = get_callback_uri_changes(
+        [x.uri for x in dev_app.callback_uris or []],
+        unique_callback_uris,
+    )
+
+    # Apply the changes with one statement each in a single transaction, so the application's callback URIs are never
+    # seen half updated. Concurrent updates adding the same URI are skipped by the unique constraint
+    if uris_to_create or uris_to_delete:
+        async with prisma_db.tx() as transaction:
+            if uris_to_delete:
+                await CallbackUri.prisma(transaction).delete_many(
+                    where={
+                        "developer_application_id": dev_app.id,
+                        "uri": {"in": uris_to_delete},
+                    },
+                )
+
+            if uris_to_create:
+                await CallbackUri.prisma(transaction).create_many(
+                    data=[{"developer_application_id": dev_app.id, "uri": x} for x in uris_to_create],
+                    skip_duplicates=True,
+                )
+
+        invalidate_callback_uris(dev_app.id)
 
     return DeveloperApplicationDto(id=dev_app.id, owner_id=dev_app.owner_id, name=dev_app.name)
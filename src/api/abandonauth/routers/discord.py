@@ -1,8 +1,9 @@
 import httpx
 from fastapi import APIRouter
-from prisma.models import User
 
 from abandonauth.dependencies.auth.jwt import generate_short_lived_jwt
+from abandonauth.dependencies.services import get_or_create_oauth_user
+from abandonauth.dependencies.upstream import discord_upstream
 from abandonauth.models import DiscordLoginDto, JwtDto
 from abandonauth.settings import settings
 
@@ -11,10 +12,12 @@ router = APIRouter(
     tags=["Discord"],
 )
 
-DISCORD_API_BASE = "https://discord.com/api/v10"
 
-
-async def login_with_discord(login_data: DiscordLoginDto, application_id: str) -> JwtDto:
+async def login_with_discord(
+        http_client: httpx.AsyncClient,
+        login_data: DiscordLoginDto,
+        application_id: str,
+) -> JwtDto:
     """Log a user in using Discord's OAuth2 as validation."""
     # Gather access token
     data = {
@@ -26,38 +29,25 @@ async def login_with_discord(login_data: DiscordLoginDto, application_id: str) -
     }
 
     headers = {"Content-Type": "application/x-www-form-urlencoded"}
-    async with httpx.AsyncClient(headers=headers) as client:
-        response = await client.post(f"{DISCORD_API_BASE}/oauth2/token", data=data)
-        response.raise_for_status()
-
-        token = response.json()["access_token"]
-
-        response = await client.get(
-            f"{DISCORD_API_BASE}/users/@me",
-            headers={"Authorization": f"Bearer {token}"},
-        )
-
-        response.raise_for_status()
-        discord_user = response.json()
-
-    user = await User.prisma().find_first(
-        where={
-            "discord_account": {
-                "is": {
-                    "id": int(discord_user["id"]),
-                },
-            },
-        },
+    response = await discord_upstream.request(
+        http_client,
+        "POST",
+        f"{settings.DISCORD_API_BASE_URL}/oauth2/token",
+        data=data,
+        headers=headers,
+    )
+
+    token = response.json()["access_token"]
+
+    response = await discord_upstream.request(
+        http_client,
+        "GET",
+        f"{settings.DISCORD_API_BASE_URL}/users/@me",
+        headers={"Authorization": f"Bearer {token}"},
     )
 
-    if user is None:
-        user = await User.prisma().create({
-            "username": discord_user["username"],
-            "discord_account": {
-                "create": {
-                    "id": int(discord_user["id"]),
-                },
-            },
-        })
-
-    return JwtDto(token=generate_short_lived_jwt(user.id, application_id))
+    discord_user = response.json()
+
+    user = await get_or_create_oauth_user("discord_account", int(discord_user["id"]), discord_user["username"])
+
+    return JwtDto(token=await generate_short_lived_jwt(user.id, application_id))
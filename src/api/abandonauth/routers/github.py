@@ -1,8 +1,10 @@
 import httpx
-from fastapi import APIRouter
-from prisma.models import User
+from fastapi import APIRouter, HTTPException
+from starlette.status import HTTP_400_BAD_REQUEST
 
 from abandonauth.dependencies.auth.jwt import generate_short_lived_jwt
+from abandonauth.dependencies.services import get_or_create_oauth_user
+from abandonauth.dependencies.upstream import github_upstream
 from abandonauth.models import JwtDto
 from abandonauth.settings import settings
 
@@ -12,7 +14,7 @@ router = APIRouter(
 )
 
 
-async def login_with_github(code: str, application_id: str) -> JwtDto:
+async def login_with_github(http_client: httpx.AsyncClient, code: str, application_id: str) -> JwtDto:
     """Log a user in using GitHubs's OAuth2 as validation."""
     data = {
         "client_id": settings.GITHUB_CLIENT_ID,
@@ -22,38 +24,28 @@ async def login_with_github(code: str, application_id: str) -> JwtDto:
     }
 
     headers = {"Accept": "application/json"}
-    async with httpx.AsyncClient(headers=headers) as client:
-        response = await client.post("https://github.com/login/oauth/access_token", data=data)
-        response.raise_for_status()
-
-        token = response.json()["access_token"]
-
-        response = await client.get(
-            "https://api.github.com/user",
-            headers={"Authorization": f"Bearer {token}"},
-        )
-
-        response.raise_for_status()
-        github_user = response.json()
-
-    user = await User.prisma().find_first(
-        where={
-            "github_account": {
-                "is": {
-                    "id": int(github_user["id"]),
-                },
-            },
-        },
+    response = await github_upstream.request(
+        http_client,
+        "POST",
+        f"{settings.GITHUB_BASE_URL}/login/oauth/access_token",
+        data=data,
+        headers=headers,
     )
 
-    if user is None:
-        user = await User.prisma().create({
-            "username": github_user["login"],
-            "github_account": {
-                "create": {
-                    "id": int(github_user["id"]),
-                },
-            },
-        })
-
-    return JwtDto(token=generate_short_lived_jwt(user.id, application_id))
+    # GitHub responds to invalid or expired codes with a 200 and an error in the body
+    token = response.json().get("access_token")
+    if not token:
+        raise HTTPException(status_code=HTTP_400_BAD_REQUEST, detail="GitHub rejected the login request")
+
+    response = await github_upstream.request(
+        http_client,
+        "GET",
+        f"{settings.GITHUB_API_BASE_URL}/user",
+        headers={**headers, "Authorization": f"Bearer {token}"},
+    )
+
+    github_user = response.json()
+
+    user = await get_or_create_oauth_user("github_account", int(github_user["id"]), github_user["login"])
+
+    return JwtDto(token=await generate_short_lived_jwt(user.id, application_id))
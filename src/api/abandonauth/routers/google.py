@@ -1,9 +1,10 @@
-import httpx
 from fastapi import APIRouter
-from prisma.models import User
 from starlette.responses import RedirectResponse
 
 from abandonauth.dependencies.auth.jwt import generate_short_lived_jwt
+from abandonauth.dependencies.http_client import HttpClientDep
+from abandonauth.dependencies.services import get_or_create_oauth_user
+from abandonauth.dependencies.upstream import google_upstream
 from abandonauth.models import JwtDto
 from abandonauth.settings import settings
 
@@ -14,7 +15,7 @@ router = APIRouter(
 
 
 @router.get("", response_model=JwtDto)
-async def login_with_google(code: str, state: str) -> RedirectResponse:
+async def login_with_google(code: str, state: str, http_client: HttpClientDep) -> RedirectResponse:
     """Log a user in using Google's OAuth2 as validation."""
     data = {
         "client_id": settings.GOOGLE_CLIENT_ID,
@@ -25,39 +26,27 @@ async def login_with_google(code: str, state: str) -> RedirectResponse:
     }
 
     headers = {"Accept": "application/json"}
-    async with httpx.AsyncClient(headers=headers) as client:
-        response = await client.post("https://oauth2.googleapis.com/token", data=data)
+    response = await google_upstream.request(
+        http_client,
+        "POST",
+        f"{settings.GOOGLE_OAUTH_BASE_URL}/token",
+        data=data,
+        headers=headers,
+    )
 
-        response.raise_for_status()
+    token = response.json()["access_token"]
 
-        token = response.json()["access_token"]
+    response = await google_upstream.request(
+        http_client,
+        "GET",
+        f"{settings.GOOGLE_OPENID_BASE_URL}/v1/userinfo",
+        headers={**headers, "Authorization": f"Bearer {token}"},
+    )
 
-        response = await client.get(
-            "https://openidconnect.googleapis.com/v1/userinfo",
-            headers={"Authorization": f"Bearer {token}"},
-        )
+    google_user = response.json()
 
-        response.raise_for_status()
-        google_user = response.json()
+    user = await get_or_create_oauth_user("google_account", google_user["sub"], google_user["name"])
 
-    user = await User.prisma().find_first(
-        where={
-            "google_account": {
-                "is": {
-                    "id": google_user["sub"],
-                },
-            },
-        },
-    )
+    exchange_token = await generate_short_lived_jwt(user.id, "fake_application_id")
 
-    if user is None:
-        user = await User.prisma().create({
-            "username": google_user["name"],
-            "google_account": {
-                "create": {
-                    "id": google_user["sub"],
-                },
-            },
-        })
-
-    return RedirectResponse(f"{state}?authentication={generate_short_lived_jwt(user.id, 'fake_application_id')}")
+    return RedirectResponse(f"{state}?authentication={exchange_token}")
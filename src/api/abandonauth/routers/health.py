@@ -0,0 +1,28 @@
+from fastapi import APIRouter, Response
+from starlette.status import HTTP_200_OK, HTTP_503_SERVICE_UNAVAILABLE
+
+from abandonauth.database import prisma_db
+from abandonauth.models.health import ReadinessDto
+from abandonauth.warm_up import readiness
+
+router = APIRouter(prefix="/health", tags=["Health"])
+
+
+@router.get(
+    "/ready",
+    summary="Whether the worker finished warming up and can serve traffic.",
+    response_description="Readiness of the worker, with a 503 status code while it is not ready.",
+    response_model=ReadinessDto,
+    responses={HTTP_503_SERVICE_UNAVAILABLE: {"model": ReadinessDto}},
+)
+def get_readiness(response: Response) -> ReadinessDto:
+    """
+    Report whether the worker is ready for traffic.
+
+    Load balancers should hold traffic until this returns 200. It returns 503 until warm-up on startup completes, when
+    the database connection is lost, and once the worker starts shutting down.
+    """
+    ready = readiness.ready and prisma_db.is_connected()
+    response.status_code = HTTP_200_OK if ready else HTTP_503_SERVICE_UNAVAILABLE
+
+    return ReadinessDto(ready=ready, warm_up_seconds=readiness.warm_up_seconds)
@@ -1,20 +1,40 @@
 import contextlib
-from typing import Annotated
+from typing import Annotated, TYPE_CHECKING
+from urllib.parse import urlencode
+from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, Header, Response
+from fastapi import APIRouter, Depends, HTTPException, Header, Request, Response
 from fastapi.responses import RedirectResponse
-from prisma.models import DeveloperApplication
-from starlette.status import HTTP_401_UNAUTHORIZED
+from prisma.errors import ForeignKeyViolationError
+from starlette.status import HTTP_400_BAD_REQUEST, HTTP_401_UNAUTHORIZED, HTTP_403_FORBIDDEN
 
+from abandonauth.database import get_read_client
 from abandonauth.dependencies.auth.developer_application_deps import LoginDevAppWithOptionalCredentialsDep
+from abandonauth.dependencies.auth.exchange_token_store import exchange_token_store
 from abandonauth.dependencies.auth.jwt import (
+    DeveloperAppJwtBearer,
     JWTBearer,
     OptionalDeveloperAppJwtBearer,
-    valid_token_cache,
+    decode_jwt,
 )
-from abandonauth.dependencies.services import get_new_token, identify_user
-from abandonauth.models import DeveloperApplicationDto, JwtDto, UserDto
-from abandonauth.models.auth import JwtClaimsDataDto, ScopeEnum
+from abandonauth.dependencies.auth.revocation import revocation_list
+from abandonauth.dependencies.auth.signing_keys import jwks
+from abandonauth.dependencies.conditional import conditional_response
+from abandonauth.dependencies.services import get_new_token, identify_user, introspect_tokens, lookup_users
+from abandonauth.models import DeveloperApplicationDto, JwksDto, JwtDto, UserDto
+from abandonauth.models.auth import (
+    IntrospectBatchDto,
+    JwtClaimsDataDto,
+    LifespanEnum,
+    ScopeEnum,
+    TokenIntrospectionDto,
+)
+from abandonauth.models.developer_application import DeveloperApplicationSummary
+from abandonauth.models.user import UserLookupDto, UserLookupResultDto
+from abandonauth.settings import settings
+
+if TYPE_CHECKING:
+    from prisma.types import DeveloperApplicationWhereInput
 
 router = APIRouter()
 
@@ -27,31 +47,79 @@ def index() -> RedirectResponse:
 
 @router.get(
     "/user/applications",
-    summary="List all developer applications owned by the current user.",
-    response_description="List of developer applications",
+    summary="List the developer applications owned by the current user, one page at a time.",
+    response_description="A page of developer applications, ordered by ID",
     response_model=list[DeveloperApplicationDto],
 )
 async def get_user_applications(
+        response: Response,
         token_data: JwtClaimsDataDto = Depends(JWTBearer()),
+        limit: int = settings.APPLICATION_LIST_DEFAULT_LIMIT,
+        after: UUID | None = None,
 ) -> list[DeveloperApplicationDto]:
-    """List all developer applications owned by the authenticated user."""
-    dev_apps = await DeveloperApplication.prisma().find_many(
-        where={
-            "owner_id": token_data.user_id,
-        },
+    """
+    List the developer applications owned by the authenticated user, ordered by ID.
+
+    Returns at most limit applications with an ID greater than after. When the page is full, a Link header with
+    rel="next" gives the query string of the next page. The next page can be empty.
+    """
+    if not 1 <= limit <= settings.APPLICATION_LIST_MAX_LIMIT:
+        raise HTTPException(
+            status_code=HTTP_400_BAD_REQUEST,
+            detail=f"limit must be between 1 and {settings.APPLICATION_LIST_MAX_LIMIT}",
+        )
+
+    where: DeveloperApplicationWhereInput = {"owner_id": token_data.user_id}
+
+    if after is not None:
+        where["id"] = {"gt": str(after)}
+
+    # Keyset pagination on the (owner_id, id) index, selecting only the columns in DeveloperApplicationDto
+    dev_apps = await DeveloperApplicationSummary.prisma(get_read_client()).find_many(
+        where=where,
+        order={"id": "asc"},
+        take=limit,
     )
 
+    # The link is relative to the request URL, so it stays valid behind the proxy serving the API under /api
+    if len(dev_apps) == limit:
+        next_query = urlencode({"after": dev_apps[-1].id, "limit": limit})
+        response.headers["Link"] = f'<?{next_query}>; rel="next"'
+
     return [DeveloperApplicationDto(name=x.name, id=x.id, owner_id=x.owner_id) for x in dev_apps]
 
 
 @router.get("/me", response_model=UserDto)
 async def current_user_information(
+        request: Request,
         token_data: JwtClaimsDataDto = Depends(JWTBearer(scope=ScopeEnum.identify)),
-) -> UserDto:
-    """Get information about the user from a jwt token."""
+) -> Response:
+    """
+    Get information about the user from a jwt token.
+
+    Supports conditional requests, a 304 is returned when the If-None-Match header matches the user's current ETag.
+    """
     user = await identify_user(token_data.user_id)
 
-    return UserDto(id=user.id, username=user.username)
+    return conditional_response(request, UserDto(id=user.id, username=user.username), token_data)
+
+
+@router.post(
+    "/users/lookup",
+    summary="Look up many users by ID at once.",
+    response_description="The users that were found and the IDs that do not belong to any user.",
+    response_model=UserLookupResultDto,
+    dependencies=[Depends(DeveloperAppJwtBearer())],
+)
+async def lookup_users_by_id(lookup_data: UserLookupDto) -> UserLookupResultDto:
+    """Resolve the given user IDs to users for the authenticated developer application in a single request."""
+    if len(lookup_data.ids) > settings.USER_LOOKUP_MAX_IDS:
+        raise HTTPException(
+            status_code=HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.USER_LOOKUP_MAX_IDS} users can be looked up at once",
+        )
+
+    return await lookup_users([str(x) for x in lookup_data.ids])
 
 
 @router.post(
@@ -60,7 +128,7 @@ async def current_user_information(
     response_description="A long-lived JWT to authenticate the user on AbandonAuth.",
     response_model=JwtDto,
 )
-def login_user(
+async def login_user(
         authenticated_dev_app: LoginDevAppWithOptionalCredentialsDep,
         dev_app_token: Annotated[JwtClaimsDataDto | None, Depends(OptionalDeveloperAppJwtBearer())],
         exchange_token: Annotated[str, Header()],
@@ -80,17 +148,92 @@ def login_user(
             detail="Either a developer application JWT must be given in headers "
                    "or the developer application credentials must be passed in the request body",
         )
-    return get_new_token(exchange_token, app_id)
+    return await get_new_token(exchange_token, app_id)
+
+
+@router.post(
+    "/introspect/batch",
+    summary="Validate many user tokens issued to the current developer application at once.",
+    response_description="Validity, claims and user for each token, in the same order as the given tokens.",
+    response_model=list[TokenIntrospectionDto],
+)
+async def introspect_token_batch(
+        introspect_data: IntrospectBatchDto,
+        dev_app_token: JwtClaimsDataDto = Depends(DeveloperAppJwtBearer()),
+) -> list[TokenIntrospectionDto]:
+    """
+    Validate the given user tokens and resolve their users in a single request.
+
+    Only tokens issued for the authenticated developer application are considered valid.
+    """
+    if len(introspect_data.tokens) > settings.INTROSPECT_BATCH_MAX_TOKENS:
+        raise HTTPException(
+            status_code=HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.INTROSPECT_BATCH_MAX_TOKENS} tokens can be introspected at once",
+        )
+
+    return await introspect_tokens(introspect_data.tokens, dev_app_token.user_id)
 
 
 @router.post("/burn-token", status_code=200)
-def burn_jwt(token: JwtDto) -> Response:
+async def burn_jwt(token: JwtDto) -> Response:
     """
     Invalidate the given JWT.
 
-    Attempts to delete the given token. Returns 200 response regardless of if the token existed.
+    Exchange tokens are deleted, valid long-lived tokens are revoked until they expire.
+    Returns 200 response regardless of if the token existed.
     """
-    with contextlib.suppress(KeyError):
-        valid_token_cache.remove(token.token)
+    if await exchange_token_store.consume(token.token):
+        return Response(status_code=200)
+
+    with contextlib.suppress(HTTPException):
+        token_data = await decode_jwt(token.token, required_scope=ScopeEnum.none)
+
+        if token_data.lifespan == LifespanEnum.long and token_data.jti is not None:
+            await revocation_list.revoke_token(token_data.jti, token_data.exp)
 
     return Response(status_code=200)
+
+
+@router.post(
+    "/revoke-all-tokens",
+    summary="Log the current user out everywhere by revoking every token issued to them.",
+    status_code=200,
+)
+async def revoke_all_tokens(token_data: JwtClaimsDataDto = Depends(JWTBearer())) -> Response:
+    """
+    Revoke every token issued to the authenticated user so far, including the token used for this request.
+
+    Revocations reach every worker within TOKEN_REVOCATION_REFRESH_SECONDS. Developer application tokens are rejected
+    with a 403, they do not belong to a user.
+    """
+    try:
+        await revocation_list.revoke_user(token_data.user_id)
+    except ForeignKeyViolationError as e:
+        raise HTTPException(
+            status_code=HTTP_403_FORBIDDEN,
+            detail="Only tokens issued to a user can revoke all of the user's tokens",
+        ) from e
+
+    # Tokens issued in the same second as the revocation are not covered by it, so this token is also revoked by its ID
+    if token_data.lifespan == LifespanEnum.long and token_data.jti is not None:
+        await revocation_list.revoke_token(token_data.jti, token_data.exp)
+
+    return Response(status_code=200)
+
+
+@router.get(
+    "/.well-known/jwks.json",
+    summary="Public keys used to verify AbandonAuth JWTs.",
+    response_description="A JSON Web Key Set, empty when JWTs are signed with a shared secret.",
+    response_model=JwksDto,
+)
+def get_jwks(response: Response) -> JwksDto:
+    """
+    Get the public keys used to verify AbandonAuth JWTs.
+
+    Relying applications can use these keys to verify tokens locally rather than calling /me for every request.
+    Keys are selected using the kid header of the JWT.
+    """
+    response.headers["Cache-Control"] = f"public, max-age={settings.JWKS_CACHE_MAX_AGE_SECONDS}"
+    return jwks
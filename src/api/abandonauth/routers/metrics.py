@@ -0,0 +1,109 @@
+import hmac
+import re
+from typing import Annotated
+
+from fastapi import APIRouter, HTTPException, Header
+from fastapi.responses import PlainTextResponse
+from prisma.errors import PrismaError
+from starlette.status import HTTP_401_UNAUTHORIZED
+
+from abandonauth.cache import TTLCache
+from abandonauth.database import InstrumentedPrisma, prisma_db, replica_db
+from abandonauth.dependencies.auth.developer_application_deps import verified_credentials_cache
+from abandonauth.dependencies.auth.exchange_token_store import InMemoryExchangeTokenStore, exchange_token_store
+from abandonauth.dependencies.auth.hash import hash_pool_stats
+from abandonauth.dependencies.auth.jwt import decoded_token_cache
+from abandonauth.dependencies.auth.revocation import revocation_list
+from abandonauth.dependencies.services import callback_uri_cache
+from abandonauth.dependencies.upstream import CircuitState, upstream_providers
+from abandonauth.metrics import (
+    cache_entries,
+    cache_evictions_total,
+    cache_hits_total,
+    cache_misses_total,
+    exchange_token_store_entries,
+    exchange_token_store_evictions_total,
+    hash_pool_pending,
+    metrics_registry,
+    revocation_list_entries,
+    upstream_circuit_open,
+)
+from abandonauth.settings import settings
+
+router = APIRouter(tags=["Metrics"])
+
+# Prometheus text exposition format
+METRICS_MEDIA_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Prefix of the metrics exported by Prisma's query engine
+PRISMA_METRICS_PREFIX = "prisma_"
+
+caches: dict[str, TTLCache] = {
+    "decoded_token": decoded_token_cache,
+    "verified_credentials": verified_credentials_cache,
+    "callback_uri": callback_uri_cache,
+}
+
+
+def _collect_state_metrics() -> None:
+    """Update the metrics that mirror the current state of caches, stores and pools, rather than events."""
+    for name, cache in caches.items():
+        stats = cache.stats
+        cache_entries.labels(name).set(stats.size)
+        cache_hits_total.labels(name).set_total(stats.hits)
+        cache_misses_total.labels(name).set_total(stats.misses)
+        cache_evictions_total.labels(name).set_total(stats.evictions)
+
+    if isinstance(exchange_token_store, InMemoryExchangeTokenStore):
+        store_stats = exchange_token_store.stats
+        exchange_token_store_entries.set(store_stats.size)
+        exchange_token_store_evictions_total.labels("expired").set_total(store_stats.expired_evictions)
+        exchange_token_store_evictions_total.labels("capacity").set_total(store_stats.capacity_evictions)
+
+    hash_pool_pending.set(hash_pool_stats.pending)
+
+    revocation_stats = revocation_list.stats
+    revocation_list_entries.labels("token").set(revocation_stats.revoked_tokens)
+    revocation_list_entries.labels("user").set(revocation_stats.revoked_users)
+
+    for provider in upstream_providers:
+        upstream_circuit_open.labels(provider.name).set(provider.state != CircuitState.closed)
+
+
+async def _get_prisma_metrics(client: InstrumentedPrisma, prefix: str) -> str:
+    """
+    Return the query engine's metrics in the Prometheus text exposition format, or nothing if they are unavailable.
+
+    These include the open, busy and idle connections of the database connection pool, and how long queries waited for
+    a connection. Metric names are prefixed with the given prefix instead of "prisma_", so engines can be told apart.
+    """
+    if not client.is_connected():
+        return ""
+
+    try:
+        metrics = await client.get_metrics(format="prometheus")
+    except PrismaError:
+        return ""
+
+    if prefix == PRISMA_METRICS_PREFIX:
+        return metrics
+
+    return re.sub(rf"^(# (?:HELP|TYPE) )?{PRISMA_METRICS_PREFIX}", rf"\g<1>{prefix}", metrics, flags=re.MULTILINE)
+
+
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics(authorization: Annotated[str | None, Header()] = None) -> PlainTextResponse:
+    """Get the metrics of this worker and its Prisma query engine in the Prometheus text exposition format."""
+    # Settings validation requires a token whenever this router is included
+    expected_token = settings.METRICS_BEARER_TOKEN.get_secret_value() if settings.METRICS_BEARER_TOKEN else ""
+
+    if not expected_token or not hmac.compare_digest(authorization or "", f"Bearer {expected_token}"):
+        raise HTTPException(status_code=HTTP_401_UNAUTHORIZED)
+
+    _collect_state_metrics()
+    prisma_metrics = await _get_prisma_metrics(prisma_db, PRISMA_METRICS_PREFIX)
+
+    if replica_db is not None:
+        prisma_metrics += await _get_prisma_metrics(replica_db, "prisma_replica_")
+
+    return PlainTextResponse(metrics_registry.render() + prisma_metrics, media_type=METRICS_MEDIA_TYPE)
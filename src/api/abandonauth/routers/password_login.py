@@ -21,7 +21,7 @@ async def create_test_user(user_data: PasswordAccountSchema) -> UserDto:
         "username": user_data.username,
         "password_account": {
             "create": {
-                "password": get_hashed_data(user_data.password),
+                "password": await get_hashed_data(user_data.password),
             },
         },
     })
@@ -36,12 +36,12 @@ async def login_test_user(user_data: PasswordLoginDto, res: Response) -> JwtDto:
             "user_id": str(user_data.user_id),
         },
     )
-    if password_account is None or not verify_data(user_data.password, password_account.password):
+    if password_account is None or not await verify_data(user_data.password, password_account.password):
         raise HTTPException(
             status_code=HTTP_401_UNAUTHORIZED,
             detail="Invalid username or password",
         )
 
-    access_token = generate_long_lived_jwt(str(password_account.user_id), settings.ABANDON_AUTH_DEVELOPER_APP_ID)
+    access_token = await generate_long_lived_jwt(str(password_account.user_id), settings.ABANDON_AUTH_DEVELOPER_APP_ID)
     res.set_cookie("Authorization", access_token, domain=settings.ABANDON_AUTH_SITE_URL, secure=True, httponly=True)
     return JwtDto(token=access_token)
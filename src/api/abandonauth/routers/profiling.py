@@ -0,0 +1,76 @@
+import hmac
+import tracemalloc
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, HTTPException, Header
+from fastapi.responses import PlainTextResponse
+from starlette.status import HTTP_403_FORBIDDEN
+
+from abandonauth.settings import settings
+
+
+def verify_profiling_admin(x_abandonauth_profile: Annotated[str | None, Header()] = None) -> None:
+    """Raise a 403 unless the profiling admin token is configured and was given in the X-AbandonAuth-Profile header."""
+    admin_token = settings.PROFILING_ADMIN_TOKEN.get_secret_value() if settings.PROFILING_ADMIN_TOKEN else ""
+
+    if not admin_token or not hmac.compare_digest(x_abandonauth_profile or "", admin_token):
+        raise HTTPException(status_code=HTTP_403_FORBIDDEN)
+
+
+router = APIRouter(
+    prefix="/debug",
+    tags=["Profiling"],
+    dependencies=[Depends(verify_profiling_admin)],
+    include_in_schema=False,
+)
+
+# Allocations made by tracemalloc itself and by imports are not useful when looking for leaks
+SNAPSHOT_FILTERS = [
+    tracemalloc.Filter(inclusive=False, filename_pattern=tracemalloc.__file__),
+    tracemalloc.Filter(inclusive=False, filename_pattern="<frozen importlib._bootstrap*>"),
+    tracemalloc.Filter(inclusive=False, filename_pattern="<unknown>"),
+]
+
+# The snapshot that the next snapshot is compared to
+baseline_snapshot: tracemalloc.Snapshot | None = None
+
+
+@router.post("/tracemalloc/snapshot")
+def take_tracemalloc_snapshot(limit: int = 25) -> PlainTextResponse:
+    """
+    Take a memory snapshot and return the allocations that grew the most since the previous snapshot.
+
+    The first call starts tracing allocations, which slows down the worker until tracing is stopped.
+    Snapshots are per worker process.
+    """
+    global baseline_snapshot  # noqa: PLW0603
+
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(settings.PROFILING_TRACEMALLOC_FRAMES)
+        baseline_snapshot = tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS)
+        return PlainTextResponse("Started tracing allocations, take another snapshot to see what changed\n")
+
+    snapshot = tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS)
+    current, peak = tracemalloc.get_traced_memory()
+    lines = [f"Traced memory: {current / 1024:.1f} KiB, peak {peak / 1024:.1f} KiB", ""]
+
+    if baseline_snapshot is not None:
+        key_type = "traceback" if settings.PROFILING_TRACEMALLOC_FRAMES > 1 else "lineno"
+        for stat in snapshot.compare_to(baseline_snapshot, key_type)[:limit]:
+            lines.append(str(stat))
+
+            if key_type == "traceback":
+                lines.extend(f"    {x}" for x in stat.traceback.format())
+
+    baseline_snapshot = snapshot
+    return PlainTextResponse("\n".join(lines) + "\n")
+
+
+@router.delete("/tracemalloc")
+def stop_tracemalloc() -> PlainTextResponse:
+    """Stop tracing allocations and forget the previous snapshot."""
+    global baseline_snapshot  # noqa: PLW0603
+
+    tracemalloc.stop()
+    baseline_snapshot = None
+    return PlainTextResponse("Stopped tracing allocations\n")
@@ -1,47 +1,42 @@
+import contextlib
 
-import httpx
 from fastapi import APIRouter, HTTPException, Request
 from fastapi.responses import RedirectResponse
-from prisma.models import DeveloperApplication
-from starlette.status import HTTP_200_OK, HTTP_400_BAD_REQUEST, HTTP_403_FORBIDDEN
+from starlette.status import HTTP_400_BAD_REQUEST, HTTP_403_FORBIDDEN
 
+from abandonauth.dependencies.auth.jwt import decode_jwt
+from abandonauth.dependencies.http_client import HttpClientDep
+from abandonauth.dependencies.services import get_callback_uris, get_new_token, identify_user
 from abandonauth.models import DiscordLoginDto
+from abandonauth.models.auth import ScopeEnum
 from abandonauth.routers.discord import login_with_discord
 from abandonauth.routers.github import login_with_github
 from abandonauth.settings import settings
 
 router = APIRouter(prefix="/ui")
 
-BASE_URL = settings.ABANDON_AUTH_URL
-
 
 @router.get("/", include_in_schema=False)
 async def index(request: Request, code: str | None = None) -> RedirectResponse:
     """Developer landing page for AbandonAuth UI."""
     if code:
-        login_body = {
-            "id": settings.ABANDON_AUTH_DEVELOPER_APP_ID,
-            "refresh_token": settings.ABANDON_AUTH_DEVELOPER_APP_TOKEN,
-        }
-
-        login_headers = {
-            "exchange-token": code,
-        }
-
-        async with httpx.AsyncClient() as client:
-            resp = await client.post(f"{BASE_URL}/login", headers=login_headers, json=login_body)
-
+        # Exchange the token in-process as the AbandonAuth developer application, rather than calling our own /login
         # If login failed, set token to None so that the user will be redirected back to the login page
-        token = None if resp.status_code != HTTP_200_OK else resp.json().get("token")
+        try:
+            token = (await get_new_token(code, settings.ABANDON_AUTH_DEVELOPER_APP_ID)).token
+        except HTTPException:
+            token = None
     else:
         token = request.cookies.get("Authorization")
 
     authenticated = False
 
     if token:
-        async with httpx.AsyncClient() as client:
-            headers = {"Authorization": f"Bearer {token}"}
-            authenticated = (await client.get(f"{BASE_URL}/me", headers=headers)).status_code == HTTP_200_OK
+        # Equivalent to a successful request to /me with the token
+        with contextlib.suppress(HTTPException):
+            token_data = await decode_jwt(token, required_scope=ScopeEnum.identify)
+            await identify_user(token_data.user_id)
+            authenticated = True
 
     resp = RedirectResponse(settings.ABANDON_AUTH_SITE_URL)
 
@@ -64,7 +59,7 @@ async def index(request: Request, code: str | None = None) -> RedirectResponse:
 
 
 @router.get("/discord-callback")
-async def discord_callback(request: Request) -> RedirectResponse:
+async def discord_callback(request: Request, http_client: HttpClientDep) -> RedirectResponse:
     """Discord callback endpoint for authenticating with Discord OAuth with AbandonAuth UI."""
     code = request.query_params.get("code")
 
@@ -73,14 +68,9 @@ async def discord_callback(request: Request) -> RedirectResponse:
     if request_state := request.query_params.get("state"):
         app_id, redirect_url = request_state.split(",")
 
-        dev_app = await DeveloperApplication.prisma().find_unique(
-            where={"id": app_id},
-            include={"callback_uris": True},
-        )
-
         # This check is very important. application ID and callback URI must be validated
         # The state in the discord login URL cannot be trusted
-        if not dev_app or not dev_app.callback_uris or redirect_url not in [x.uri for x in dev_app.callback_uris]:
+        if redirect_url not in await get_callback_uris(app_id):
             raise HTTPException(
                 status_code=HTTP_403_FORBIDDEN,
                 detail="Invalid application ID or callback_uri",
@@ -93,7 +83,7 @@ async def discord_callback(request: Request) -> RedirectResponse:
 
     if code:
         login_data = DiscordLoginDto(code=code, redirect_uri=settings.ABANDON_AUTH_DISCORD_CALLBACK)
-        exchange_token = (await login_with_discord(login_data, app_id)).token
+        exchange_token = (await login_with_discord(http_client, login_data, app_id)).token
 
         return RedirectResponse(f"{redirect_url}?code={exchange_token}")
 
@@ -101,7 +91,7 @@ async def discord_callback(request: Request) -> RedirectResponse:
 
 
 @router.get("/github-callback")
-async def github_callback(request: Request) -> RedirectResponse:
+async def github_callback(request: Request, http_client: HttpClientDep) -> RedirectResponse:
     """GitHub callback endpoint for authenticating with GitHub OAuth with AbandonAuth UI."""
     code = request.query_params.get("code")
 
@@ -110,14 +100,9 @@ async def github_callback(request: Request) -> RedirectResponse:
     if request_state := request.query_params.get("state"):
         app_id, redirect_url = request_state.split(",")
 
-        dev_app = await DeveloperApplication.prisma().find_unique(
-            where={"id": app_id},
-            include={"callback_uris": True},
-        )
-
         # This check is very important. application ID and callback URI must be validated
         # The state in the github login URL cannot be trusted
-        if not dev_app or not dev_app.callback_uris or redirect_url not in [x.uri for x in dev_app.callback_uris]:
+        if redirect_url not in await get_callback_uris(app_id):
             raise HTTPException(
                 status_code=HTTP_403_FORBIDDEN,
                 detail="Invalid application ID or callback_uri",
@@ -129,7 +114,7 @@ async def github_callback(request: Request) -> RedirectResponse:
         )
 
     if code:
-        exchange_token = (await login_with_github(code, app_id)).token
+        exchange_token = (await login_with_github(http_client, code, app_id)).token
 
         return RedirectResponse(f"{redirect_url}?code={exchange_token}")
 
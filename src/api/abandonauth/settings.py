@@ -1,3 +1,5 @@
+from typing import Literal
+
 import pydantic
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -6,33 +8,140 @@ class Settings(BaseSettings):
     """Settings are loaded from .env."""
 
     DATABASE_URL: pydantic.SecretStr
+    # Database connection pool of each worker, overriding connection_limit, pool_timeout and socket_timeout in
+    # DATABASE_URL. Every worker has its own pool, so when DATABASE_MAX_CONNECTIONS is set it is split evenly between
+    # the WEB_CONCURRENCY workers instead of using DATABASE_POOL_SIZE. WEB_CONCURRENCY also sets uvicorn's worker count.
+    # Queries wait up to the pool timeout for a free connection, and fail if the database does not answer in time
+    DATABASE_POOL_SIZE: int = 10
+    DATABASE_MAX_CONNECTIONS: int | None = None
+    WEB_CONCURRENCY: int = 1
+    DATABASE_POOL_TIMEOUT_SECONDS: int = 10
+    DATABASE_QUERY_TIMEOUT_SECONDS: int = 10
+    # Optional read replica for read-only lookups such as /me, with its own pool of the same size. Reads made after a
+    # write in the same request, and credential checks, stay on the primary
+    DATABASE_REPLICA_URL: pydantic.SecretStr | None = None
 
     JWT_SECRET: pydantic.SecretStr
     JWT_HASHING_ALGO: str
+    # Asymmetric algorithms (ES256, RS256, etc.) sign with "<kid>.pem" private keys from JWT_SIGNING_KEYS_DIR instead
+    # of JWT_SECRET. Every key in the directory is published as a JWKS and accepted for verification, only the active
+    # key signs new tokens. Rotate by adding a key, making it active, then removing the old key after its tokens expire
+    JWT_SIGNING_KEYS_DIR: str | None = None
+    JWT_ACTIVE_KEY_ID: str | None = None
+    JWKS_CACHE_MAX_AGE_SECONDS: int = 3600
+    # How long clients may reuse /me and developer application responses before revalidating them with If-None-Match,
+    # never beyond the expiry of the token used
+    IDENTITY_CACHE_MAX_AGE_SECONDS: int = 60
+    INTROSPECT_BATCH_MAX_TOKENS: int = 100
+    USER_LOOKUP_MAX_IDS: int = 100
+    # Page size of /user/applications when no limit is given, and the largest limit accepted
+    APPLICATION_LIST_DEFAULT_LIMIT: int = 100
+    APPLICATION_LIST_MAX_LIMIT: int = 500
     JWT_EXPIRES_IN_SECONDS_LONG_LIVED: int
     JWT_EXPIRES_IN_SECONDS_SHORT_LIVED: int
+    # Cache of decoded long-lived tokens, set the size to 0 to disable. Entries never outlive the token's exp
+    JWT_DECODE_CACHE_MAX_SIZE: int = 10_000
+    JWT_DECODE_CACHE_TTL_SECONDS: int = 3600
+    # Revoked long-lived tokens are checked in memory, each worker fetches new revocations from the database this often
+    TOKEN_REVOCATION_REFRESH_SECONDS: float = 5
+
+    # "memory" only works with a single worker, "database" shares exchange tokens between all workers
+    EXCHANGE_TOKEN_STORE: Literal["memory", "database"] = "memory"
+    # Maximum number of unexchanged tokens held by the "memory" store, the soonest expiring are evicted first when full
+    EXCHANGE_TOKEN_CACHE_MAX_SIZE: int = 100_000
+
+    # Key for developer application refresh token hashes. Changing this invalidates every refresh token
+    REFRESH_TOKEN_PEPPER: pydantic.SecretStr
+
+    # Number of threads used for bcrypt hashing and verification
+    HASH_POOL_SIZE: int = 4
+
+    # Cache of successful developer application logins, set the size to 0 to disable.
+    # Token resets only invalidate the cache of the worker handling them, an old refresh token stays valid on other
+    # workers until the TTL. Unless a size is set, the cache is disabled when several workers or instances may run.
+    CREDENTIAL_CACHE_MAX_SIZE: int | None = None
+    CREDENTIAL_CACHE_TTL_SECONDS: int = 60
+
+    # Cache of developer application callback URIs used to validate OAuth callbacks, set the size to 0 to disable.
+    # Changes only invalidate the cache of the worker handling them, a removed callback URI stays valid on other workers
+    # until the TTL. Unless a size is set, the cache is disabled when several workers or instances may be running.
+    CALLBACK_URI_CACHE_MAX_SIZE: int | None = None
+    CALLBACK_URI_CACHE_TTL_SECONDS: int = 60
+    # Most callback URIs a developer application can have, bounding the cost of updating and checking them
+    CALLBACK_URI_MAX_PER_APPLICATION: int = 500
+
+    # Prometheus metrics served at /metrics, off by default. Scrapers must send METRICS_BEARER_TOKEN as a bearer token,
+    # it is required when metrics are enabled
+    METRICS_ENABLED: bool = False
+    METRICS_BEARER_TOKEN: pydantic.SecretStr | None = None
+
+    # Sampling profiler, off by default. Profiles PROFILING_SAMPLE_RATE of requests, and requests with the admin token
+    # in the X-AbandonAuth-Profile header, writing folded stacks per route to PROFILING_OUTPUT_DIR.
+    # The admin token also enables the /debug/tracemalloc endpoints
+    PROFILING_ENABLED: bool = False
+    PROFILING_SAMPLE_RATE: float = 0.0
+    PROFILING_ADMIN_TOKEN: pydantic.SecretStr | None = None
+    PROFILING_INTERVAL_SECONDS: float = 0.005
+    PROFILING_OUTPUT_DIR: str = "profiles"
+    PROFILING_TRACEMALLOC_FRAMES: int = 1
+
+    # Warm-up run on startup, /health/ready reports the worker as not ready until it completes.
+    # Opens WARM_UP_DATABASE_CONNECTIONS database connections ahead of traffic, failed attempts are retried after a wait
+    WARM_UP_ENABLED: bool = True
+    WARM_UP_DATABASE_CONNECTIONS: int = 4
+    WARM_UP_RETRY_SECONDS: float = 5
 
     ABANDON_AUTH_DEVELOPER_APP_ID: str
     ABANDON_AUTH_DEVELOPER_APP_TOKEN: str
     ABANDON_AUTH_SITE_URL: str
     ABANDON_AUTH_URL: str
 
+    # Connection pool for outbound requests to OAuth providers
+    HTTP_CLIENT_MAX_CONNECTIONS: int = 100
+    HTTP_CLIENT_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_CLIENT_KEEPALIVE_EXPIRY_SECONDS: float = 60
+
+    # Requests to OAuth providers. GET requests are retried, providers failing repeatedly are skipped for a cooldown
+    UPSTREAM_CONNECT_TIMEOUT_SECONDS: float = 2
+    UPSTREAM_MAX_RETRIES: int = 2
+    UPSTREAM_CIRCUIT_FAILURE_THRESHOLD: int = 5
+    UPSTREAM_CIRCUIT_RESET_SECONDS: float = 30
+
+    # Provider *_BASE_URL settings can point at local stand-ins, such as the load test's stub providers
     DISCORD_REDIRECT: str
     ABANDON_AUTH_DISCORD_CALLBACK: str
     DISCORD_CLIENT_ID: str
     DISCORD_CLIENT_SECRET: pydantic.SecretStr
+    DISCORD_HTTP_TIMEOUT_SECONDS: float = 5
+    DISCORD_API_BASE_URL: str = "https://discord.com/api/v10"
 
     ABANDON_AUTH_GITHUB_CALLBACK: str
     GITHUB_REDIRECT: str
     GITHUB_CLIENT_ID: str
     GITHUB_CLIENT_SECRET: pydantic.SecretStr
+    GITHUB_HTTP_TIMEOUT_SECONDS: float = 5
+    GITHUB_BASE_URL: str = "https://github.com"
+    GITHUB_API_BASE_URL: str = "https://api.github.com"
 
     GOOGLE_CLIENT_ID: str
     GOOGLE_CLIENT_SECRET: pydantic.SecretStr
     GOOGLE_CALLBACK: str
+    GOOGLE_HTTP_TIMEOUT_SECONDS: float = 5
+    GOOGLE_OAUTH_BASE_URL: str = "https://oauth2.googleapis.com"
+    GOOGLE_OPENID_BASE_URL: str = "https://openidconnect.googleapis.com"
+
     DEBUG: bool
 
     model_config = SettingsConfigDict(frozen=True, env_file=".env", env_file_encoding="utf-8")
 
+    @pydantic.model_validator(mode="after")
+    def _require_metrics_token(self) -> "Settings":
+        """Refuse to serve metrics without authentication, they expose traffic and database pool internals."""
+        if self.METRICS_ENABLED and not self.METRICS_BEARER_TOKEN:
+            msg = "METRICS_BEARER_TOKEN must be set when METRICS_ENABLED is set"
+            raise ValueError(msg)
+
+        return self
+
 
 settings = Settings()  # pyright: ignore [reportCallIssue]
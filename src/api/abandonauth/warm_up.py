@@ -0,0 +1,126 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+
+import httpx
+from fastapi import FastAPI
+from prisma.models import CallbackUri, DeveloperApplication, User
+
+from abandonauth.database import InstrumentedPrisma, pool_size, prisma_db, replica_db
+from abandonauth.dependencies.auth.hash import get_hashed_data, verify_data
+from abandonauth.dependencies.auth.jwt import decode_jwt, generate_long_lived_jwt
+from abandonauth.dependencies.auth.revocation import revocation_list
+from abandonauth.dependencies.upstream import discord_upstream, github_upstream, google_upstream
+from abandonauth.models.auth import ScopeEnum
+from abandonauth.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# User ID of the token encoded and decoded during warm-up, it does not belong to any user
+WARM_UP_USER_ID = "00000000-0000-0000-0000-000000000000"
+
+
+@dataclass(slots=True)
+class Readiness:
+    """Whether this worker finished warming up and can be sent traffic."""
+
+    ready: bool = False
+    attempts: int = 0
+    warm_up_seconds: float | None = None
+
+
+readiness = Readiness()
+
+
+async def _warm_up_database(client: InstrumentedPrisma) -> None:
+    """Open database connections concurrently, then run a cheap query for each model used on the hot paths."""
+    connections = min(settings.WARM_UP_DATABASE_CONNECTIONS, pool_size)
+    await asyncio.gather(*(client.query_raw("SELECT 1") for _ in range(connections)))
+
+    await User.prisma(client).find_first()
+    await DeveloperApplication.prisma(client).find_first()
+    await CallbackUri.prisma(client).find_first()
+
+
+async def _warm_up_tokens() -> None:
+    """Load the signing key and the bcrypt backend, and start a hashing thread."""
+    token = await generate_long_lived_jwt(WARM_UP_USER_ID, settings.ABANDON_AUTH_DEVELOPER_APP_ID)
+    await decode_jwt(token, settings.ABANDON_AUTH_DEVELOPER_APP_ID, ScopeEnum.none)
+
+    hashed_data = await get_hashed_data(WARM_UP_USER_ID)
+    await verify_data(WARM_UP_USER_ID, hashed_data)
+
+
+async def _connect_to_providers(http_client: httpx.AsyncClient) -> None:
+    """
+    Open a kept-alive connection to every OAuth provider host, so the first logins skip the TCP and TLS handshakes.
+
+    Failures are only logged, a provider being down must not keep the worker from serving other requests.
+    """
+    provider_urls = [
+        (discord_upstream, settings.DISCORD_API_BASE_URL),
+        (github_upstream, settings.GITHUB_BASE_URL),
+        (github_upstream, settings.GITHUB_API_BASE_URL),
+        (google_upstream, settings.GOOGLE_OAUTH_BASE_URL),
+        (google_upstream, settings.GOOGLE_OPENID_BASE_URL),
+    ]
+
+    results = await asyncio.gather(
+        *(http_client.head(url, timeout=provider.timeout) for provider, url in provider_urls),
+        return_exceptions=True,
+    )
+
+    for (provider, url), result in zip(provider_urls, results, strict=True):
+        if isinstance(result, Exception):
+            logger.warning("Could not connect to %s at %s during warm-up: %r", provider.name, url, result)
+
+
+async def _warm_up_replica() -> None:
+    """
+    Warm up the read replica if it is connected.
+
+    Failures are only logged, reads fall back to the primary and the replica must not keep the worker from serving.
+    """
+    if replica_db is None or not replica_db.is_connected():
+        return
+
+    try:
+        await _warm_up_database(replica_db)
+    except Exception:
+        logger.exception("Could not warm up the read replica")
+
+
+async def warm_up(app: FastAPI) -> None:
+    """
+    Prepare this worker for traffic, then mark it as ready.
+
+    Primes the database connection pools, the token signing and hashing code paths, the OpenAPI schema and the
+    connections to OAuth providers. Failures other than the read replica and provider connections are retried until
+    warm-up succeeds.
+    """
+    started_at = time.perf_counter()
+
+    while True:
+        readiness.attempts += 1
+
+        try:
+            await _warm_up_database(prisma_db)
+
+            # Revoked tokens must be rejected from the first request
+            await revocation_list.refresh()
+
+            await _warm_up_tokens()
+        except Exception:
+            logger.exception("Warm-up attempt %d failed, retrying", readiness.attempts)
+            await asyncio.sleep(settings.WARM_UP_RETRY_SECONDS)
+        else:
+            break
+
+    app.openapi()
+    await _warm_up_replica()
+    await _connect_to_providers(app.state.http_client)
+
+    readiness.warm_up_seconds = time.perf_counter() - started_at
+    readiness.ready = True
+    logger.info("Warm-up completed in %.2fs", readiness.warm_up_seconds)
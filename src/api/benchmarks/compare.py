@@ -0,0 +1,87 @@
+"""
+Compare two load test results and report regressions.
+
+A route regresses when its requests per second drop, or its p95 or p99 latency rise, by more than the threshold, or when
+it starts returning errors. Exits with status 1 if any route regressed.
+
+    python -m benchmarks.compare benchmarks/results/<baseline>.json benchmarks/results/<candidate>.json
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Any
+
+
+def _change(baseline: float, candidate: float) -> float:
+    """Return the relative change from baseline to candidate as a percentage."""
+    if not baseline:
+        return 0.0
+
+    return (candidate - baseline) / baseline * 100
+
+
+def _regressions(baseline: dict[str, Any], candidate: dict[str, Any], threshold: float) -> list[str]:
+    """Return a description of each metric of a route that regressed by more than the threshold percentage."""
+    regressions = []
+
+    if _change(baseline["rps"], candidate["rps"]) < -threshold:
+        regressions.append("req/s")
+
+    regressions.extend(
+        metric
+        for metric in ("p95_ms", "p99_ms")
+        if _change(baseline[metric], candidate[metric]) > threshold
+    )
+
+    if candidate["errors"] and not baseline["errors"]:
+        regressions.append("errors")
+
+    return regressions
+
+
+def main() -> None:
+    """Print the change of each route between two load test results."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline", type=Path)
+    parser.add_argument("candidate", type=Path)
+    parser.add_argument("--threshold", type=float, default=10, help="Allowed change in percent before regressing")
+    args = parser.parse_args()
+
+    baseline = json.loads(args.baseline.read_text())
+    candidate = json.loads(args.candidate.read_text())
+
+    if baseline["config"] != candidate["config"]:
+        print("Warning: the results were recorded with different load test configurations\n")
+
+    print(f"{baseline['label']} -> {candidate['label']}\n")
+    print(f"{'route':<50} {'req/s':>16} {'p50 ms':>16} {'p95 ms':>16} {'p99 ms':>16}  regressions")
+
+    baseline_routes = {**baseline["routes"], "total": baseline["total"]}
+    candidate_routes = {**candidate["routes"], "total": candidate["total"]}
+    regressed = False
+
+    for route, candidate_summary in candidate_routes.items():
+        baseline_summary = baseline_routes.get(route)
+
+        if baseline_summary is None:
+            print(f"{route:<50} (not in baseline)")
+            continue
+
+        line = f"{route:<50}"
+        for metric in ("rps", "p50_ms", "p95_ms", "p99_ms"):
+            change = _change(baseline_summary[metric], candidate_summary[metric])
+            line += f" {candidate_summary[metric]:>8.1f} {change:>+6.1f}%"
+
+        regressions = _regressions(baseline_summary, candidate_summary, args.threshold)
+        regressed = regressed or bool(regressions)
+        print(f"{line}  {', '.join(regressions)}")
+
+    for route in baseline_routes.keys() - candidate_routes.keys():
+        print(f"{route:<50} (not in candidate)")
+
+    sys.exit(1 if regressed else 0)
+
+
+if __name__ == "__main__":
+    main()
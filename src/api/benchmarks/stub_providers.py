@@ -0,0 +1,73 @@
+"""
+Local stand-ins for the Discord, GitHub and Google OAuth APIs used by the load test.
+
+Each provider exchanges any code for an access token equal to the code, and returns a user whose ID is taken from the
+token, so that a load test can log in many distinct users without contacting the real providers.
+An artificial response delay can be set with STUB_PROVIDER_LATENCY_MS to model the latency of the real providers.
+
+    uvicorn benchmarks.stub_providers:app --port 9100
+"""
+import asyncio
+import os
+from typing import Annotated
+
+from fastapi import FastAPI, Form, Header
+
+LATENCY_SECONDS = int(os.environ.get("STUB_PROVIDER_LATENCY_MS", "0")) / 1000
+
+app = FastAPI(title="Stub OAuth providers")
+
+
+async def _simulate_latency() -> None:
+    if LATENCY_SECONDS:
+        await asyncio.sleep(LATENCY_SECONDS)
+
+
+def _user_number(authorization: str) -> int:
+    """Return the user number encoded in a "Bearer user-<n>" authorization header."""
+    return int(authorization.removeprefix("Bearer user-"))
+
+
+@app.post("/discord/oauth2/token")
+async def discord_token(code: Annotated[str, Form()]) -> dict[str, str]:
+    """Exchange a Discord OAuth code for an access token."""
+    await _simulate_latency()
+    return {"access_token": code, "token_type": "Bearer"}
+
+
+@app.get("/discord/users/@me")
+async def discord_user(authorization: Annotated[str, Header()]) -> dict[str, str]:
+    """Return the Discord user for an access token."""
+    await _simulate_latency()
+    number = _user_number(authorization)
+    return {"id": str(number), "username": f"discord-user-{number}"}
+
+
+@app.post("/github/login/oauth/access_token")
+async def github_token(code: Annotated[str, Form()]) -> dict[str, str]:
+    """Exchange a GitHub OAuth code for an access token."""
+    await _simulate_latency()
+    return {"access_token": code, "token_type": "bearer"}
+
+
+@app.get("/github-api/user")
+async def github_user(authorization: Annotated[str, Header()]) -> dict[str, str | int]:
+    """Return the GitHub user for an access token."""
+    await _simulate_latency()
+    number = _user_number(authorization)
+    return {"id": number, "login": f"github-user-{number}"}
+
+
+@app.post("/google/token")
+async def google_token(code: Annotated[str, Form()]) -> dict[str, str]:
+    """Exchange a Google OAuth code for an access token."""
+    await _simulate_latency()
+    return {"access_token": code, "token_type": "Bearer"}
+
+
+@app.get("/google-openid/v1/userinfo")
+async def google_user(authorization: Annotated[str, Header()]) -> dict[str, str]:
+    """Return the Google user for an access token."""
+    await _simulate_latency()
+    number = _user_number(authorization)
+    return {"sub": str(number), "name": f"google-user-{number}"}
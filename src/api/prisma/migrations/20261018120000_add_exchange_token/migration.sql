@@ -0,0 +1,10 @@
+-- CreateTable
+CREATE TABLE "ExchangeToken" (
+    "id" TEXT NOT NULL,
+    "expires_at" TIMESTAMP(3) NOT NULL,
+
+    CONSTRAINT "ExchangeToken_pkey" PRIMARY KEY ("id")
+);
+
+-- CreateIndex
+CREATE INDEX "ExchangeToken_expires_at_idx" ON "ExchangeToken"("expires_at");
@@ -0,0 +1,2 @@
+-- CreateIndex
+CREATE INDEX "DeveloperApplication_owner_id_id_idx" ON "DeveloperApplication"("owner_id", "id");
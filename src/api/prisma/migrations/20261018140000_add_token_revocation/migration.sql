@@ -0,0 +1,28 @@
+-- CreateTable
+CREATE TABLE "RevokedToken" (
+    "id" TEXT NOT NULL,
+    "expires_at" TIMESTAMP(3) NOT NULL,
+    "revoked_at" TIMESTAMP(3) NOT NULL,
+
+    CONSTRAINT "RevokedToken_pkey" PRIMARY KEY ("id")
+);
+
+-- CreateTable
+CREATE TABLE "UserTokenRevocation" (
+    "user_id" UUID NOT NULL,
+    "revoked_before" TIMESTAMP(3) NOT NULL,
+
+    CONSTRAINT "UserTokenRevocation_pkey" PRIMARY KEY ("user_id")
+);
+
+-- CreateIndex
+CREATE INDEX "RevokedToken_revoked_at_idx" ON "RevokedToken"("revoked_at");
+
+-- CreateIndex
+CREATE INDEX "RevokedToken_expires_at_idx" ON "RevokedToken"("expires_at");
+
+-- CreateIndex
+CREATE INDEX "UserTokenRevocation_revoked_before_idx" ON "UserTokenRevocation"("revoked_before");
+
+-- AddForeignKey
+ALTER TABLE "UserTokenRevocation" ADD CONSTRAINT "UserTokenRevocation_user_id_fkey" FOREIGN KEY ("user_id") REFERENCES "User"("id") ON DELETE CASCADE ON UPDATE CASCADE;
@@ -0,0 +1,61 @@
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from abandonauth.cache import TTLCache, get_worker_local_cache_size
+
+
+class TTLCacheGenerationTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.cache: TTLCache[str, int] = TTLCache(max_size=10, ttl_seconds=60)
+
+    def test_set_with_current_generation(self) -> None:
+        generation = self.cache.generation("a")
+        self.cache.set("a", 1, generation=generation)
+
+        self.assertEqual(self.cache.get("a"), 1)
+
+    def test_set_after_invalidate_is_skipped(self) -> None:
+        generation = self.cache.generation("a")
+        self.cache.invalidate("a")
+        self.cache.set("a", 1, generation=generation)
+
+        self.assertIsNone(self.cache.get("a"))
+
+    def test_set_after_clear_is_skipped(self) -> None:
+        generation = self.cache.generation("a")
+        self.cache.clear()
+        self.cache.set("a", 1, generation=generation)
+
+        self.assertIsNone(self.cache.get("a"))
+
+    def test_invalidating_other_key_keeps_generation(self) -> None:
+        generation = self.cache.generation("a")
+        self.cache.invalidate("b")
+        self.cache.set("a", 1, generation=generation)
+
+        self.assertEqual(self.cache.get("a"), 1)
+
+
+class GetWorkerLocalCacheSizeTests(unittest.TestCase):
+    def _size(self, configured_size: int | None, **settings: object) -> int:
+        settings = {"WEB_CONCURRENCY": 1, "EXCHANGE_TOKEN_STORE": "memory", **settings}
+
+        with mock.patch("abandonauth.cache.settings", SimpleNamespace(**settings)):
+            return get_worker_local_cache_size(configured_size, 1024)
+
+    def test_single_worker_uses_default(self) -> None:
+        self.assertEqual(self._size(None), 1024)
+
+    def test_several_workers_disable_cache(self) -> None:
+        self.assertEqual(self._size(None, WEB_CONCURRENCY=4), 0)
+
+    def test_database_exchange_token_store_disables_cache(self) -> None:
+        self.assertEqual(self._size(None, EXCHANGE_TOKEN_STORE="database"), 0)
+
+    def test_configured_size_is_used(self) -> None:
+        self.assertEqual(self._size(10, WEB_CONCURRENCY=4), 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
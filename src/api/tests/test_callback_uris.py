@@ -0,0 +1,126 @@
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+from uuid import UUID
+
+from fastapi import HTTPException
+
+from abandonauth.dependencies.services import get_callback_uri_changes
+from abandonauth.routers import developer_application
+from abandonauth.settings import settings
+
+APP_ID = "00000000-0000-0000-0000-00000000000a"
+USER_ID = "00000000-0000-0000-0000-000000000001"
+TOKEN_DATA = SimpleNamespace(user_id=USER_ID)
+
+
+class GetCallbackUriChangesTests(unittest.TestCase):
+    def test_changes(self) -> None:
+        to_create, to_delete = get_callback_uri_changes(["a", "b", "c"], ["b", "d", "d", "e"])
+
+        self.assertEqual(to_create, ["d", "e"])
+        self.assertCountEqual(to_delete, ["a", "c"])
+
+    def test_no_changes(self) -> None:
+        self.assertEqual(get_callback_uri_changes(["a", "b"], ["b", "a"]), ([], []))
+
+
+class UpdateCallbackUrisTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.transaction = mock.MagicMock()
+        self.prisma_db = mock.MagicMock()
+        self.prisma_db.tx.return_value.__aenter__ = mock.AsyncMock(return_value=self.transaction)
+        self.prisma_db.tx.return_value.__aexit__ = mock.AsyncMock(return_value=None)
+
+        self.callback_uris = mock.MagicMock()
+        self.callback_uris.delete_many = mock.AsyncMock()
+        self.callback_uris.create_many = mock.AsyncMock()
+        callback_uri = mock.MagicMock()
+        callback_uri.prisma.return_value = self.callback_uris
+
+        self.dev_apps = mock.MagicMock()
+        self.invalidate = mock.MagicMock()
+
+        patchers = [
+            mock.patch.object(developer_application, "prisma_db", self.prisma_db),
+            mock.patch.object(developer_application, "CallbackUri", callback_uri),
+            mock.patch.object(developer_application, "DeveloperApplicationWithCallbackUris", self.dev_apps),
+            mock.patch.object(developer_application, "invalidate_callback_uris", self.invalidate),
+        ]
+
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _existing(self, *uris: str) -> None:
+        dev_app = SimpleNamespace(
+            id=APP_ID,
+            owner_id=USER_ID,
+            name="app",
+            callback_uris=[SimpleNamespace(uri=x) for x in uris],
+        )
+        self.dev_apps.prisma.return_value.find_unique = mock.AsyncMock(return_value=dev_app)
+
+    async def _update(self, callback_uris: list[str]) -> None:
+        await developer_application.update_developer_application_callback_uris(UUID(APP_ID), callback_uris, TOKEN_DATA)
+
+    async def test_changes_are_applied_in_one_transaction(self) -> None:
+        self._existing("https://a.test", "https://b.test")
+
+        await self._update(["https://b.test", "https://c.test", "https://c.test"])
+
+        self.prisma_db.tx.assert_called_once()
+        developer_application.CallbackUri.prisma.assert_called_with(self.transaction)
+        self.callback_uris.delete_many.assert_awaited_once_with(
+            where={"developer_application_id": APP_ID, "uri": {"in": ["https://a.test"]}},
+        )
+        self.callback_uris.create_many.assert_awaited_once_with(
+            data=[{"developer_application_id": APP_ID, "uri": "https://c.test"}],
+            skip_duplicates=True,
+        )
+        self.invalidate.assert_called_once_with(APP_ID)
+
+    async def test_unchanged_uris_skip_the_transaction(self) -> None:
+        self._existing("https://a.test")
+
+        await self._update(["https://a.test", "https://a.test"])
+
+        self.prisma_db.tx.assert_not_called()
+        self.invalidate.assert_not_called()
+
+    async def test_duplicates_do_not_count_towards_limit(self) -> None:
+        self._existing()
+
+        await self._update(["https://a.test"] * (settings.CALLBACK_URI_MAX_PER_APPLICATION + 1))
+
+        self.callback_uris.create_many.assert_awaited_once_with(
+            data=[{"developer_application_id": APP_ID, "uri": "https://a.test"}],
+            skip_duplicates=True,
+        )
+
+    async def test_too_many_uris_are_rejected(self) -> None:
+        self._existing()
+        uris = [f"https://{x}.test" for x in range(settings.CALLBACK_URI_MAX_PER_APPLICATION + 1)]
+
+        with self.assertRaises(HTTPException) as context:
+            await self._update(uris)
+
+        self.assertEqual(context.exception.status_code, 400)
+        self.prisma_db.tx.assert_not_called()
+
+    async def test_other_users_application_is_not_found(self) -> None:
+        self._existing("https://a.test")
+
+        with self.assertRaises(HTTPException) as context:
+            await developer_application.update_developer_application_callback_uris(
+                UUID(APP_ID),
+                ["https://b.test"],
+                SimpleNamespace(user_id="someone-else"),
+            )
+
+        self.assertEqual(context.exception.status_code, 404)
+        self.prisma_db.tx.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import unittest
+from datetime import UTC, datetime, timedelta
+from types import SimpleNamespace
+from unittest import mock
+
+from fastapi import Request
+
+from abandonauth.dependencies.conditional import compute_etag, conditional_response, etag_matches
+from abandonauth.models import UserDto
+from abandonauth.models.auth import JwtClaimsDataDto, LifespanEnum
+from abandonauth.routers import index
+from abandonauth.settings import settings
+
+USER = UserDto(id="00000000-0000-0000-0000-000000000001", username="user")
+
+
+def _request(if_none_match: str | None = None) -> Request:
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match is not None else []
+    return Request({"type": "http", "method": "GET", "path": "/me", "headers": headers})
+
+
+def _token_data(expires_in: timedelta = timedelta(days=1)) -> JwtClaimsDataDto:
+    return JwtClaimsDataDto(
+        user_id=USER.id,
+        exp=datetime.now(UTC) + expires_in,
+        scope="identify",
+        aud="app",
+        lifespan=LifespanEnum.long,
+    )
+
+
+class EtagTests(unittest.TestCase):
+    def test_etag_changes_with_content(self) -> None:
+        self.assertEqual(compute_etag(USER), compute_etag(USER.model_copy()))
+        self.assertNotEqual(compute_etag(USER), compute_etag(USER.model_copy(update={"username": "renamed"})))
+
+    def test_etag_matches(self) -> None:
+        etag = compute_etag(USER)
+
+        self.assertTrue(etag_matches(etag, etag))
+        self.assertTrue(etag_matches(f'"other", W/{etag}', etag))
+        self.assertTrue(etag_matches("*", etag))
+        self.assertFalse(etag_matches('"other"', etag))
+        self.assertFalse(etag_matches(None, etag))
+
+
+class ConditionalResponseTests(unittest.TestCase):
+    def test_response_has_etag_and_cache_headers(self) -> None:
+        response = conditional_response(_request(), USER, _token_data())
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.body, USER.model_dump_json().encode())
+        self.assertEqual(response.headers["ETag"], compute_etag(USER))
+        self.assertEqual(
+            response.headers["Cache-Control"],
+            f"private, max-age={settings.IDENTITY_CACHE_MAX_AGE_SECONDS}",
+        )
+        self.assertEqual(response.headers["Vary"], "Authorization")
+
+    def test_matching_etag_returns_304(self) -> None:
+        response = conditional_response(_request(compute_etag(USER)), USER, _token_data())
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.body, b"")
+        self.assertEqual(response.headers["ETag"], compute_etag(USER))
+
+    def test_stale_etag_returns_content(self) -> None:
+        stale_etag = compute_etag(USER.model_copy(update={"username": "old"}))
+
+        response = conditional_response(_request(stale_etag), USER, _token_data())
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_max_age_never_outlives_token(self) -> None:
+        response = conditional_response(_request(), USER, _token_data(timedelta(seconds=-5)))
+
+        self.assertEqual(response.headers["Cache-Control"], "private, max-age=0")
+
+
+class CurrentUserInformationTests(unittest.IsolatedAsyncioTestCase):
+    async def test_me_returns_304_for_current_etag(self) -> None:
+        user = SimpleNamespace(id=USER.id, username=USER.username)
+
+        with mock.patch.object(index, "identify_user", mock.AsyncMock(return_value=user)):
+            first = await index.current_user_information(_request(), _token_data())
+            second = await index.current_user_information(_request(first.headers["ETag"]), _token_data())
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.status_code, 304)
+
+
+if __name__ == "__main__":
+    unittest.main()
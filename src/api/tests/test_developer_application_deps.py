@@ -0,0 +1,52 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+from uuid import uuid4
+
+from abandonauth.dependencies.auth import developer_application_deps
+from abandonauth.dependencies.auth.developer_application_deps import (
+    authenticate_developer_application,
+    invalidate_developer_application_credentials,
+    verified_credentials_cache,
+)
+
+
+class AuthenticateDeveloperApplicationTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        verified_credentials_cache.clear()
+        self.addCleanup(verified_credentials_cache.clear)
+
+    async def test_credentials_invalidated_during_authentication_are_not_cached(self) -> None:
+        app_id = uuid4()
+        dev_app = SimpleNamespace(id=str(app_id), refresh_token="hash")  # noqa: S106
+        verifying = asyncio.Event()
+        reset = asyncio.Event()
+
+        async def verify_data(*_: str) -> bool:
+            verifying.set()
+            await reset.wait()
+            return True
+
+        model = mock.patch.object(developer_application_deps, "DeveloperApplication")
+        self.addCleanup(model.stop)
+        model.start().prisma.return_value.find_unique = mock.AsyncMock(return_value=dev_app)
+
+        with (
+            mock.patch.object(developer_application_deps, "verify_data", verify_data),
+            mock.patch.object(developer_application_deps, "is_legacy_refresh_token_hash", return_value=False),
+        ):
+            authentication = asyncio.create_task(authenticate_developer_application(app_id, "old-token"))
+
+            # The refresh token is reset while the old token is being verified
+            await verifying.wait()
+            invalidate_developer_application_credentials(str(app_id))
+            reset.set()
+
+            self.assertIs(await authentication, dev_app)
+
+        self.assertIsNone(verified_credentials_cache.get(str(app_id)))
+
+
+if __name__ == "__main__":
+    unittest.main()
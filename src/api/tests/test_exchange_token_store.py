@@ -0,0 +1,110 @@
+import unittest
+from datetime import UTC, datetime
+from unittest import mock
+
+from abandonauth.dependencies.auth import exchange_token_store
+from abandonauth.dependencies.auth.exchange_token_store import (
+    DatabaseExchangeTokenStore,
+    InMemoryExchangeTokenStore,
+    token_digest,
+)
+
+
+def _at(timestamp: float) -> datetime:
+    return datetime.fromtimestamp(timestamp, UTC)
+
+
+class InMemoryExchangeTokenStoreTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.now = 1000.0
+        patcher = mock.patch(
+            "abandonauth.dependencies.auth.exchange_token_store.time.time",
+            side_effect=lambda: self.now,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.store = InMemoryExchangeTokenStore(max_size=10)
+
+    async def test_evicting_consumed_token_keeps_live_tokens(self) -> None:
+        await self.store.add("t1", _at(1120))
+        self.assertTrue(await self.store.consume("t1"))
+
+        self.now = 1060
+        await self.store.add("t2", _at(1180))
+
+        self.now = 1130
+        await self.store.add("t3", _at(1250))
+
+        self.assertTrue(await self.store.contains("t2"))
+        self.assertTrue(await self.store.contains("t3"))
+        self.assertEqual(self.store.stats.expired_evictions, 0)
+
+    async def test_expired_tokens_are_evicted(self) -> None:
+        await self.store.add("t1", _at(1120))
+        await self.store.add("t2", _at(1180))
+
+        self.now = 1150
+
+        self.assertFalse(await self.store.contains("t1"))
+        self.assertTrue(await self.store.contains("t2"))
+        self.assertEqual(self.store.stats.expired_evictions, 1)
+
+    async def test_full_store_evicts_soonest_expiring(self) -> None:
+        store = InMemoryExchangeTokenStore(max_size=2)
+        await store.add("t1", _at(1120))
+        await store.add("t2", _at(1180))
+        await store.add("t3", _at(1250))
+
+        self.assertFalse(await store.contains("t1"))
+        self.assertTrue(await store.contains("t2"))
+        self.assertTrue(await store.contains("t3"))
+        self.assertEqual(store.stats.capacity_evictions, 1)
+
+
+class DatabaseExchangeTokenStoreTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        patcher = mock.patch.object(exchange_token_store, "ExchangeToken")
+        self.actions = patcher.start().prisma.return_value
+        self.addCleanup(patcher.stop)
+
+        self.store = DatabaseExchangeTokenStore()
+
+    async def test_add_stores_digest(self) -> None:
+        self.actions.create = mock.AsyncMock()
+        self.actions.delete_many = mock.AsyncMock()
+
+        await self.store.add("token", _at(1120))
+
+        self.actions.create.assert_awaited_once_with({"id": token_digest("token"), "expires_at": _at(1120)})
+
+    async def test_consume_is_a_single_conditional_delete(self) -> None:
+        self.actions.delete_many = mock.AsyncMock(return_value=1)
+
+        self.assertTrue(await self.store.consume("token"))
+
+        self.actions.delete_many.assert_awaited_once()
+        where = self.actions.delete_many.await_args.kwargs["where"]
+        self.assertEqual(where["id"], token_digest("token"))
+        self.assertIn("gt", where["expires_at"])
+
+    async def test_only_one_concurrent_consume_succeeds(self) -> None:
+        # The database deletes the row for the first DELETE, the second one deletes nothing
+        self.actions.delete_many = mock.AsyncMock(side_effect=[1, 0])
+
+        results = [await self.store.consume("token"), await self.store.consume("token")]
+
+        self.assertEqual(results, [True, False])
+
+    async def test_contains_only_counts_unexpired_tokens(self) -> None:
+        self.actions.count = mock.AsyncMock(return_value=0)
+
+        self.assertFalse(await self.store.contains("token"))
+
+        where = self.actions.count.await_args.kwargs["where"]
+        self.assertEqual(where["id"], token_digest("token"))
+        self.assertIn("gt", where["expires_at"])
+
+
+if __name__ == "__main__":
+    unittest.main()
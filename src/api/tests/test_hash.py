@@ -0,0 +1,88 @@
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+from uuid import uuid4
+
+from abandonauth.dependencies.auth import developer_application_deps
+from abandonauth.dependencies.auth.developer_application_deps import (
+    authenticate_developer_application,
+    verified_credentials_cache,
+)
+from abandonauth.dependencies.auth.hash import (
+    REFRESH_TOKEN_HASH_PREFIX,
+    generate_refresh_token,
+    get_refresh_token_hash,
+    is_legacy_refresh_token_hash,
+    pwd_context,
+    verify_data,
+)
+
+
+class RefreshTokenHashTests(unittest.IsolatedAsyncioTestCase):
+    async def test_hmac_hash_verifies(self) -> None:
+        refresh_token = generate_refresh_token()
+        hashed = get_refresh_token_hash(refresh_token)
+
+        self.assertTrue(hashed.startswith(REFRESH_TOKEN_HASH_PREFIX))
+        self.assertEqual(hashed, get_refresh_token_hash(refresh_token))
+        self.assertFalse(is_legacy_refresh_token_hash(hashed))
+        self.assertTrue(await verify_data(refresh_token, hashed))
+        self.assertFalse(await verify_data(generate_refresh_token(), hashed))
+
+    async def test_legacy_bcrypt_hash_verifies(self) -> None:
+        refresh_token = generate_refresh_token()
+        hashed = pwd_context.hash(refresh_token)
+
+        self.assertTrue(is_legacy_refresh_token_hash(hashed))
+        self.assertTrue(await verify_data(refresh_token, hashed))
+        self.assertFalse(await verify_data(generate_refresh_token(), hashed))
+
+
+class LegacyHashMigrationTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        verified_credentials_cache.clear()
+        self.addCleanup(verified_credentials_cache.clear)
+
+        patcher = mock.patch.object(developer_application_deps, "DeveloperApplication")
+        self.actions = patcher.start().prisma.return_value
+        self.addCleanup(patcher.stop)
+
+    async def test_legacy_hash_is_replaced_on_login(self) -> None:
+        app_id = uuid4()
+        refresh_token = generate_refresh_token()
+        dev_app = SimpleNamespace(id=str(app_id), refresh_token=pwd_context.hash(refresh_token))
+        migrated = SimpleNamespace(id=str(app_id), refresh_token=get_refresh_token_hash(refresh_token))
+        self.actions.find_unique = mock.AsyncMock(return_value=dev_app)
+        self.actions.update = mock.AsyncMock(return_value=migrated)
+
+        self.assertIs(await authenticate_developer_application(app_id, refresh_token), migrated)
+
+        self.actions.update.assert_awaited_once_with(
+            where={"id": str(app_id)},
+            data={"refresh_token": get_refresh_token_hash(refresh_token)},
+        )
+
+    async def test_hmac_hash_is_not_replaced(self) -> None:
+        app_id = uuid4()
+        refresh_token = generate_refresh_token()
+        dev_app = SimpleNamespace(id=str(app_id), refresh_token=get_refresh_token_hash(refresh_token))
+        self.actions.find_unique = mock.AsyncMock(return_value=dev_app)
+        self.actions.update = mock.AsyncMock()
+
+        self.assertIs(await authenticate_developer_application(app_id, refresh_token), dev_app)
+
+        self.actions.update.assert_not_awaited()
+
+    async def test_wrong_refresh_token_is_rejected(self) -> None:
+        app_id = uuid4()
+        dev_app = SimpleNamespace(id=str(app_id), refresh_token=pwd_context.hash(generate_refresh_token()))
+        self.actions.find_unique = mock.AsyncMock(return_value=dev_app)
+        self.actions.update = mock.AsyncMock()
+
+        self.assertIsNone(await authenticate_developer_application(app_id, generate_refresh_token()))
+
+        self.actions.update.assert_not_awaited()
+
+
+if __name__ == "__main__":
+    unittest.main()
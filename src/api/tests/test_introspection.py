@@ -0,0 +1,66 @@
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from fastapi import HTTPException
+
+from abandonauth.dependencies import services
+from abandonauth.dependencies.auth.jwt import generate_long_lived_jwt
+from abandonauth.dependencies.services import introspect_tokens
+from abandonauth.models.auth import IntrospectBatchDto
+from abandonauth.routers import index
+from abandonauth.settings import settings
+
+APP_ID = "00000000-0000-0000-0000-00000000000a"
+USER_ID = "00000000-0000-0000-0000-000000000001"
+DELETED_USER_ID = "00000000-0000-0000-0000-000000000002"
+
+
+class IntrospectTokensTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        patcher = mock.patch.object(services, "User")
+        self.actions = patcher.start().prisma.return_value
+        self.actions.find_many = mock.AsyncMock(return_value=[SimpleNamespace(id=USER_ID, username="user")])
+        self.addCleanup(patcher.stop)
+
+    async def test_results_follow_token_order(self) -> None:
+        valid = await generate_long_lived_jwt(USER_ID, APP_ID)
+        other_app = await generate_long_lived_jwt(USER_ID, "another-app")
+        deleted_user = await generate_long_lived_jwt(DELETED_USER_ID, APP_ID)
+
+        results = await introspect_tokens([valid, "not-a-token", other_app, deleted_user, valid], APP_ID)
+
+        self.assertEqual([x.active for x in results], [True, False, False, False, True])
+        self.assertEqual(results[0].user.username, "user")
+        self.assertEqual(results[1].detail, "Invalid token format")
+        self.assertIsNotNone(results[2].detail)
+        self.assertEqual(results[3].detail, "User not found")
+
+    async def test_users_are_fetched_with_one_query(self) -> None:
+        tokens = [await generate_long_lived_jwt(x, APP_ID) for x in (USER_ID, USER_ID, DELETED_USER_ID)]
+
+        await introspect_tokens(tokens, APP_ID)
+
+        self.actions.find_many.assert_awaited_once()
+        user_ids = self.actions.find_many.await_args.kwargs["where"]["id"]["in"]
+        self.assertCountEqual(user_ids, [USER_ID, DELETED_USER_ID])
+
+    async def test_no_query_without_valid_tokens(self) -> None:
+        results = await introspect_tokens(["not-a-token"], APP_ID)
+
+        self.assertFalse(results[0].active)
+        self.actions.find_many.assert_not_awaited()
+
+
+class IntrospectTokenBatchTests(unittest.IsolatedAsyncioTestCase):
+    async def test_too_many_tokens_are_rejected(self) -> None:
+        batch = IntrospectBatchDto(tokens=["token"] * (settings.INTROSPECT_BATCH_MAX_TOKENS + 1))
+
+        with self.assertRaises(HTTPException) as context:
+            await index.introspect_token_batch(batch, SimpleNamespace(user_id=APP_ID))
+
+        self.assertEqual(context.exception.status_code, 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,32 @@
+import unittest
+from unittest import mock
+
+from fastapi import FastAPI
+
+from abandonauth import main
+
+
+class LifespanTests(unittest.IsolatedAsyncioTestCase):
+    async def test_unreachable_replica_does_not_stop_startup(self) -> None:
+        prisma_db = mock.MagicMock(connect=mock.AsyncMock(), disconnect=mock.AsyncMock())
+        replica_db = mock.MagicMock(connect=mock.AsyncMock(side_effect=ConnectionError), disconnect=mock.AsyncMock())
+        replica_db.is_connected.return_value = False
+
+        with (
+            mock.patch.object(main, "prisma_db", prisma_db),
+            mock.patch.object(main, "replica_db", replica_db),
+            mock.patch.object(main, "create_http_client", return_value=mock.MagicMock(aclose=mock.AsyncMock())),
+            mock.patch.object(main, "revocation_list", mock.MagicMock(run=mock.AsyncMock())),
+            mock.patch.object(main, "warm_up", mock.AsyncMock()),
+            mock.patch.object(main, "hash_executor"),
+            self.assertLogs(main.logger, "ERROR"),
+        ):
+            async with main.lifespan(FastAPI()):
+                prisma_db.connect.assert_awaited_once()
+                replica_db.connect.assert_awaited_once()
+
+        replica_db.disconnect.assert_not_awaited()
+
+
+if __name__ == "__main__":
+    unittest.main()
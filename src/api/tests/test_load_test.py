@@ -0,0 +1,26 @@
+import unittest
+
+from benchmarks.load_test import _percentile
+
+
+class PercentileTests(unittest.TestCase):
+    def test_nearest_rank(self) -> None:
+        values = [float(x) for x in range(1, 151)]
+
+        self.assertEqual(_percentile(values, 50), 75)
+        self.assertEqual(_percentile(values, 99), 149)
+        self.assertEqual(_percentile(values, 99.9), 150)
+
+    def test_exact_rank(self) -> None:
+        values = [float(x) for x in range(1, 101)]
+
+        self.assertEqual(_percentile(values, 99), 99)
+        self.assertEqual(_percentile(values, 100), 100)
+
+    def test_bounds(self) -> None:
+        self.assertEqual(_percentile([1.0, 2.0], 0), 1)
+        self.assertEqual(_percentile([], 99), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
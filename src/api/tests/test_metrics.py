@@ -0,0 +1,31 @@
+import unittest
+
+from abandonauth.metrics import MetricsMiddleware, http_request_duration_seconds, http_responses_total
+
+
+async def _app(*_: object) -> None:
+    pass
+
+
+class MetricsMiddlewareTests(unittest.TestCase):
+    def test_observe_reuses_children(self) -> None:
+        middleware = MetricsMiddleware(_app)
+        route = "/test-metrics-middleware"
+        requests = http_responses_total.labels("GET", route, "200")
+        observations = http_request_duration_seconds.labels("GET", route)
+        requests_before, observations_before = requests.value, observations.count
+
+        middleware._observe("GET", route, 200, 0.01)
+        durations = middleware._durations
+        responses = middleware._responses
+        duration_children, response_children = durations["GET"], responses["GET"][route]
+        middleware._observe("GET", route, 200, 0.02)
+
+        self.assertIs(durations["GET"], duration_children)
+        self.assertIs(responses["GET"][route], response_children)
+        self.assertEqual(requests.value - requests_before, 2)
+        self.assertEqual(observations.count - observations_before, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
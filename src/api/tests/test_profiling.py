@@ -0,0 +1,43 @@
+import tempfile
+import threading
+import unittest
+from collections import Counter
+from pathlib import Path
+from unittest import mock
+
+from abandonauth.profiling import ProfilingMiddleware
+
+
+async def _app(*_: object) -> None:
+    pass
+
+
+class ProfilingMiddlewareTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        output_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(output_dir.cleanup)
+
+        self.middleware = ProfilingMiddleware(_app)
+        self.middleware.output_dir = Path(output_dir.name) / "profiles"
+
+    async def test_route_samples_are_written_off_the_event_loop(self) -> None:
+        write_folded_file = self.middleware._write_folded_file
+        writer_threads = []
+
+        def record_thread(*args: object) -> None:
+            writer_threads.append(threading.get_ident())
+            write_folded_file(*args)
+
+        with mock.patch.object(self.middleware, "_write_folded_file", record_thread):
+            await self.middleware._write_route_samples("GET /me", Counter({"a;b": 2}))
+            await self.middleware._write_route_samples("GET /me", Counter({"a;b": 1, "a;c": 1}))
+
+        self.assertNotIn(threading.get_ident(), writer_threads)
+        self.assertEqual(
+            (self.middleware.output_dir / "GET_me.folded").read_text(),
+            "a;b 3\na;c 1\n",
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import unittest
+from datetime import UTC, datetime, timedelta
+from unittest import mock
+
+from fastapi import HTTPException
+from prisma.errors import ForeignKeyViolationError
+
+from abandonauth.dependencies.auth.revocation import RevocationList
+from abandonauth.models.auth import JwtClaimsDataDto, LifespanEnum
+from abandonauth.routers import index
+
+USER_ID = "00000000-0000-0000-0000-000000000001"
+
+# Part way through a second, the resolution of iat
+REVOKED_AT = datetime(2026, 10, 18, 12, 0, 0, 600000, tzinfo=UTC)
+
+
+def _token(issued_at: datetime) -> JwtClaimsDataDto:
+    # iat is encoded in whole seconds
+    issued_at = issued_at.replace(microsecond=0)
+
+    return JwtClaimsDataDto(
+        user_id=USER_ID,
+        exp=issued_at + timedelta(days=1),
+        scope="identify",
+        aud="app",
+        lifespan=LifespanEnum.long,
+        iat=issued_at,
+    )
+
+
+class RevokeUserTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        datetime_patcher = mock.patch("abandonauth.dependencies.auth.revocation.datetime", wraps=datetime)
+        model_patcher = mock.patch("abandonauth.dependencies.auth.revocation.UserTokenRevocation")
+
+        mock_datetime = datetime_patcher.start()
+        mock_datetime.now.return_value = REVOKED_AT
+        model = model_patcher.start()
+        model.prisma.return_value.upsert = mock.AsyncMock()
+
+        self.addCleanup(datetime_patcher.stop)
+        self.addCleanup(model_patcher.stop)
+
+        self.revocation_list = RevocationList()
+        await self.revocation_list.revoke_user(USER_ID)
+
+    def test_token_issued_before_revocation_is_revoked(self) -> None:
+        self.assertTrue(self.revocation_list.is_revoked(_token(REVOKED_AT - timedelta(seconds=1))))
+
+    def test_token_issued_in_same_second_after_revocation_is_kept(self) -> None:
+        self.assertFalse(self.revocation_list.is_revoked(_token(REVOKED_AT + timedelta(milliseconds=100))))
+
+    def test_token_issued_after_revocation_is_kept(self) -> None:
+        self.assertFalse(self.revocation_list.is_revoked(_token(REVOKED_AT + timedelta(seconds=1))))
+
+
+class RevokeAllTokensTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        patcher = mock.patch.object(index, "revocation_list")
+        self.revocation_list = patcher.start()
+        self.revocation_list.revoke_user = mock.AsyncMock()
+        self.revocation_list.revoke_token = mock.AsyncMock()
+        self.addCleanup(patcher.stop)
+
+    async def test_user_token_revokes_user_and_token(self) -> None:
+        token_data = _token(REVOKED_AT).model_copy(update={"jti": "jti"})
+
+        response = await index.revoke_all_tokens(token_data)
+
+        self.assertEqual(response.status_code, 200)
+        self.revocation_list.revoke_user.assert_awaited_once_with(USER_ID)
+        self.revocation_list.revoke_token.assert_awaited_once_with("jti", token_data.exp)
+
+    async def test_developer_application_token_is_rejected(self) -> None:
+        # Developer application tokens carry the application ID, which is not a user
+        self.revocation_list.revoke_user.side_effect = ForeignKeyViolationError(
+            {"user_facing_error": {"error_code": "P2003"}},
+        )
+
+        with self.assertRaises(HTTPException) as context:
+            await index.revoke_all_tokens(_token(REVOKED_AT))
+
+        self.assertEqual(context.exception.status_code, 403)
+        self.revocation_list.revoke_token.assert_not_awaited()
+
+
+if __name__ == "__main__":
+    unittest.main()
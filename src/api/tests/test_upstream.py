@@ -0,0 +1,101 @@
+import asyncio
+import unittest
+
+import httpx
+from fastapi import HTTPException
+
+from abandonauth.dependencies.upstream import CircuitState, UpstreamProvider
+
+
+def _provider() -> UpstreamProvider:
+    # A reset timeout of 0 lets a trial request through as soon as the circuit opens
+    return UpstreamProvider(
+        "Test",
+        timeout=httpx.Timeout(1),
+        max_retries=0,
+        failure_threshold=1,
+        reset_timeout_seconds=0,
+    )
+
+
+def _client(handler: httpx.MockTransport) -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=handler)
+
+
+def _ok(_: httpx.Request) -> httpx.Response:
+    return httpx.Response(200)
+
+
+class UpstreamProviderTests(unittest.IsolatedAsyncioTestCase):
+    async def _open_circuit(self, provider: UpstreamProvider) -> None:
+        async with _client(httpx.MockTransport(lambda _: httpx.Response(500))) as client:
+            with self.assertRaises(HTTPException):
+                await provider.request(client, "POST", "https://upstream.test")
+
+        self.assertEqual(provider.state, CircuitState.half_open)
+
+    async def test_non_transport_error_finishes_trial(self) -> None:
+        provider = _provider()
+        await self._open_circuit(provider)
+
+        def too_many_redirects(request: httpx.Request) -> httpx.Response:
+            raise httpx.TooManyRedirects("Too many redirects", request=request)
+
+        async with _client(httpx.MockTransport(too_many_redirects)) as client:
+            with self.assertRaises(HTTPException) as context:
+                await provider.request(client, "POST", "https://upstream.test")
+
+        self.assertEqual(context.exception.status_code, 502)
+        self.assertEqual(provider.stats.errors, 2)
+
+        async with _client(httpx.MockTransport(_ok)) as client:
+            response = await provider.request(client, "POST", "https://upstream.test")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(provider.state, CircuitState.closed)
+
+    async def test_cancelled_trial_finishes_trial(self) -> None:
+        provider = _provider()
+        await self._open_circuit(provider)
+
+        async def never_responds(_: httpx.Request) -> httpx.Response:
+            await asyncio.Event().wait()
+            return httpx.Response(200)
+
+        async with _client(httpx.MockTransport(never_responds)) as client:
+            task = asyncio.create_task(provider.request(client, "POST", "https://upstream.test"))
+            await asyncio.sleep(0.01)
+            task.cancel()
+
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        self.assertEqual(provider.stats.errors, 2)
+
+        async with _client(httpx.MockTransport(_ok)) as client:
+            response = await provider.request(client, "POST", "https://upstream.test")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(provider.state, CircuitState.closed)
+
+    async def test_cancelled_request_is_not_a_failure(self) -> None:
+        provider = _provider()
+
+        async def never_responds(_: httpx.Request) -> httpx.Response:
+            await asyncio.Event().wait()
+            return httpx.Response(200)
+
+        async with _client(httpx.MockTransport(never_responds)) as client:
+            task = asyncio.create_task(provider.request(client, "POST", "https://upstream.test"))
+            await asyncio.sleep(0.01)
+            task.cancel()
+
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        self.assertEqual(provider.stats.errors, 0)
+        self.assertEqual(provider.state, CircuitState.closed)
+
+
+if __name__ == "__main__":
+    unittest.main()
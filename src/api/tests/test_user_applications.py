@@ -0,0 +1,62 @@
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+from uuid import UUID
+
+from fastapi import HTTPException, Response
+
+from abandonauth.routers import index
+from abandonauth.settings import settings
+
+USER_ID = "00000000-0000-0000-0000-000000000001"
+TOKEN_DATA = SimpleNamespace(user_id=USER_ID)
+
+
+def _app(number: int) -> SimpleNamespace:
+    return SimpleNamespace(id=f"00000000-0000-0000-0000-{number:012}", name=f"app {number}", owner_id=USER_ID)
+
+
+class GetUserApplicationsTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        patcher = mock.patch.object(index, "DeveloperApplicationSummary")
+        self.actions = patcher.start().prisma.return_value
+        self.addCleanup(patcher.stop)
+
+    async def _get(self, apps: list[SimpleNamespace], **kwargs: object) -> tuple[Response, list]:
+        self.actions.find_many = mock.AsyncMock(return_value=apps)
+        response = Response()
+
+        return response, await index.get_user_applications(response, TOKEN_DATA, **kwargs)
+
+    async def test_full_page_links_to_next_page(self) -> None:
+        response, apps = await self._get([_app(1), _app(2)], limit=2)
+
+        self.assertEqual([x.id for x in apps], [_app(1).id, _app(2).id])
+        self.assertEqual(response.headers["Link"], f'<?after={_app(2).id}&limit=2>; rel="next"')
+
+    async def test_last_page_has_no_link(self) -> None:
+        response, _ = await self._get([_app(1)], limit=2)
+
+        self.assertNotIn("Link", response.headers)
+
+    async def test_after_and_limit_are_passed_to_query(self) -> None:
+        await self._get([], limit=5, after=UUID(_app(3).id))
+
+        self.actions.find_many.assert_awaited_once_with(
+            where={"owner_id": USER_ID, "id": {"gt": _app(3).id}},
+            order={"id": "asc"},
+            take=5,
+        )
+
+    async def test_limit_bounds(self) -> None:
+        for limit in (0, settings.APPLICATION_LIST_MAX_LIMIT + 1):
+            with self.subTest(limit=limit), self.assertRaises(HTTPException) as context:
+                await self._get([], limit=limit)
+
+            self.assertEqual(context.exception.status_code, 400)
+
+        await self._get([], limit=settings.APPLICATION_LIST_MAX_LIMIT)
+
+
+if __name__ == "__main__":
+    unittest.main()